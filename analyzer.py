@@ -1,59 +1,206 @@
 import os
+import io
 import csv
 import json
 import uuid
-import time
 import requests
 import re
-from bs4 import BeautifulSoup
+import threading
+from bs4 import BeautifulSoup, SoupStrainer
 from google import genai
+from google.genai import errors as genai_errors
 from google.genai import types
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.utils import get_column_letter
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; screenshots are then sent as-is
+    Image = None
+from http_utils import (
+    DiskCache, RateLimiter, UnrecoverableError, failed_to_connect, get_with_retry, is_dead, make_session,
+    imap_bounded, mark_host_dead, with_retry,
+)
 
-def extract_website_data(url):
-    """Scrapes a website's text AND captures a full-page screenshot via Microlink."""
-    if not url:
-        return None
-    
-    data = {"text": "", "image_bytes": None}
-    
-    if not url.startswith('http'):
-        url = 'http://' + url
-        
-    # Step 1: Capture a full-page scrolling screenshot using Microlink
+# Rows are I/O-bound (Microlink + page fetch + Gemini), so run several at once
+# while pacing how quickly new rows start to stay under the APIs' rate limits.
+ANALYZER_MAX_WORKERS = 8
+_ROW_LIMITER = RateLimiter(2.0)
+
+# One pooled session for every Microlink/page fetch so TLS handshakes and
+# DNS lookups are shared across rows.
+_SESSION = make_session(
+    pool_size=ANALYZER_MAX_WORKERS * 2,
+    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/114.0.0.0 Safari/537.36',
+)
+
+# We keep at most 3000 chars of text, which always sits well inside the
+# first 256KB of HTML, so larger pages are truncated instead of downloaded.
+MAX_PAGE_BYTES = 256 * 1024
+_TEXT_STRAINER = SoupStrainer(['title', 'h1', 'h2', 'h3', 'p', 'li', 'a'])
+
+# Pages that loaded with less text than this are usually parked or login-gated,
+# so they aren't worth a Microlink screenshot. Pages the plain fetch couldn't load
+# (bot blocks, JS-rendered sites) still get one.
+MIN_PAGE_TEXT_FOR_SCREENSHOT = 200
+
+# Scraped text + screenshot per URL, so re-analyzing a CSV skips Microlink and the page fetch
+WEBSITE_CACHE = DiskCache(os.path.join('.cache', 'websites.sqlite'), ttl=24 * 60 * 60)
+
+# Full-page Microlink PNGs run to several MB; a 1024px-wide JPEG is plenty for
+# spotting visual issues and costs Gemini far fewer image tokens.
+SCREENSHOT_MAX_SIZE = (1024, 4096)
+SCREENSHOT_JPEG_QUALITY = 82
+
+# Leads sent to Gemini in one prompt; each call costs ~1-3s of round-trip
+# overhead, so batching a few sites together cuts the number of calls.
+PITCH_BATCH_SIZE = 4
+
+# Collapses markdown symbols and whitespace runs in one pass, and strips ```json fences
+_CLEAN_RE = re.compile(r'[\r\n\*_~#\s]+')
+_FENCE_RE = re.compile(r'^```(?:json)?\s*|\s*```$')
+
+# Gemini clients are long-lived; build one per API key and share it across rows.
+_CLIENT_CACHE = {}
+_CLIENT_LOCK = threading.Lock()
+
+# ── Report style definitions (built once, shared by every cell) ──
+_HEADER_FONT = Font(name='Calibri', bold=True, color='FFFFFFFF', size=11)
+_HEADER_FILL = PatternFill(start_color='FF1F4E79', end_color='FF1F4E79', fill_type='solid')
+_HEADER_ALIGN = Alignment(horizontal='center', vertical='center', wrap_text=True)
+
+_FINDING_FILL_1 = PatternFill(start_color='FFFFF2CC', end_color='FFFFF2CC', fill_type='solid')  # Light gold
+_FINDING_FILL_2 = PatternFill(start_color='FFD6E8F7', end_color='FFD6E8F7', fill_type='solid')  # Light blue
+_FINDING_FILL_3 = PatternFill(start_color='FFE2EFDA', end_color='FFE2EFDA', fill_type='solid')  # Light green
+_FINDING_FILLS = (_FINDING_FILL_1, _FINDING_FILL_2, _FINDING_FILL_3)
+
+_STATUS_PENDING_FILL = PatternFill(start_color='FFFCE4D6', end_color='FFFCE4D6', fill_type='solid')  # Light orange
+_STATUS_NA_FILL = PatternFill(start_color='FFD9D9D9', end_color='FFD9D9D9', fill_type='solid')       # Light gray
+
+_ROW_EVEN_FILL = PatternFill(start_color='FFF2F2F2', end_color='FFF2F2F2', fill_type='solid')
+
+_CELL_FONT = Font(name='Calibri', size=10)
+_FINDING_FONT = Font(name='Calibri', size=10, color='FF333333')
+_STATUS_PENDING_FONT = Font(name='Calibri', size=10, bold=True, color='FFC65911')
+_STATUS_NA_FONT = Font(name='Calibri', size=10, italic=True, color='FF808080')
+_CELL_ALIGN = Alignment(horizontal='left', vertical='top', wrap_text=True)
+
+_THIN_BORDER = Border(
+    left=Side(style='thin', color='FFBFBFBF'),
+    right=Side(style='thin', color='FFBFBFBF'),
+    top=Side(style='thin', color='FFBFBFBF'),
+    bottom=Side(style='thin', color='FFBFBFBF')
+)
+
+def _fetch_screenshot(url):
+    """Captures a full-page scrolling screenshot using Microlink."""
     try:
         microlink_url = f"https://api.microlink.io/?url={url}&screenshot=true&meta=false&embed=screenshot.url&fullPage=true"
-        img_response = requests.get(microlink_url, timeout=25)
+        img_response = get_with_retry(_SESSION, microlink_url, timeout=15)
         if img_response.status_code == 200 and len(img_response.content) > 5000:
-            data["image_bytes"] = img_response.content
+            return img_response.content
     except Exception:
         pass
-        
-    # Step 2: Scrape text content as fallback context
+    return None
+
+def _shrink_screenshot(image_bytes):
+    """Downscales a screenshot to a JPEG, returning (bytes, mime_type). Falls back to the original PNG."""
+    if Image is None:
+        return image_bytes, 'image/png'
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/114.0.0.0 Safari/537.36'}
-        response = requests.get(url, headers=headers, timeout=8)
-        
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            for script in soup(["script", "style"]):
-                script.extract()
-            text = soup.get_text(separator=' ', strip=True)
-            data["text"] = text[:3000]
-            return data
+        im = Image.open(io.BytesIO(image_bytes))
+        im.thumbnail(SCREENSHOT_MAX_SIZE)
+        buf = io.BytesIO()
+        im.convert('RGB').save(buf, 'JPEG', quality=SCREENSHOT_JPEG_QUALITY, optimize=True)
+        return buf.getvalue(), 'image/jpeg'
+    except Exception:
+        return image_bytes, 'image/png'
+
+def _fetch_page_text(url):
+    """
+    Scrapes the page's visible text content, remembering hosts that can't be reached.
+    Returns None if the page couldn't be fetched.
+    """
+    try:
+        with get_with_retry(_SESSION, url, max_retries=2, timeout=8, stream=True) as response:
+            if response.status_code == 200:
+                body = response.raw.read(MAX_PAGE_BYTES, decode_content=True)
+                # Only the text-bearing tags are parsed, so scripts/styles never enter the tree
+                soup = BeautifulSoup(body, 'lxml', parse_only=_TEXT_STRAINER)
+                text = soup.get_text(separator=' ', strip=True)
+                return text[:3000]
+    except requests.RequestException as e:
+        # Hosts that refuse connections or fail DNS are skipped for a day (see http_utils.is_dead)
+        if failed_to_connect(e):
+            mark_host_dead(url)
     except Exception:
         pass
+    return None
+
+def extract_website_data(url):
+    """Scrapes a website's text AND captures a full-page screenshot via Microlink."""
+    if not url:
+        return None
+    
+    data = {"text": "", "image_bytes": None, "mime_type": None}
+    
+    if not url.startswith('http'):
+        url = 'http://' + url
+    
+    cached = WEBSITE_CACHE.get(url)
+    if cached is not None:
+        return cached
+    
+    if is_dead(url):
+        return data
+    
+    # Step 1: Cheap HTML scrape first - it tells us whether the site is worth a screenshot
+    text = _fetch_page_text(url)
+    data["text"] = text or ""
+    
+    # Step 2: Skip the slow Microlink round-trip only for pages that loaded nearly empty
+    # or hosts that can't be connected to; other failed fetches may still render there
+    if text is None:
+        worth_screenshot = not is_dead(url)
+    else:
+        worth_screenshot = len(text) >= MIN_PAGE_TEXT_FOR_SCREENSHOT
+    if worth_screenshot:
+        image_bytes = _fetch_screenshot(url)
+        if image_bytes:
+            data["image_bytes"], data["mime_type"] = _shrink_screenshot(image_bytes)
+    
+    # Only cache pages we could read or render; failures may be transient
+    if data["text"] or data["image_bytes"]:
+        WEBSITE_CACHE.set(url, data)
     
     return data
 
+def _get_client(api_key):
+    """Returns the shared Gemini client for this API key, creating it on first use."""
+    with _CLIENT_LOCK:
+        client = _CLIENT_CACHE.get(api_key)
+        if client is None:
+            client = genai.Client(api_key=api_key)
+            _CLIENT_CACHE[api_key] = client
+        return client
+
+def _generate_content(client, **kwargs):
+    """Calls Gemini, flagging client errors other than rate limits as not worth retrying."""
+    try:
+        return client.models.generate_content(**kwargs)
+    except genai_errors.ClientError as e:
+        if e.code == 429:
+            raise
+        raise UnrecoverableError(str(e)) from e
+
 def generate_website_pitch(scraped_data, api_key):
     """Uses Gemini 2.5 Flash Vision to generate an owner-facing agency pitch."""
     if not scraped_data:
         return ["Failed to extract website data."]
         
     try:
-        client = genai.Client(api_key=api_key)
+        client = _get_client(api_key)
         
         prompt = f"""
         You are the Director of a Premium Web Development Agency. 
@@ -79,24 +226,18 @@ def generate_website_pitch(scraped_data, api_key):
         
         contents = [prompt]
         if scraped_data.get("image_bytes"):
-            part = types.Part.from_bytes(data=scraped_data["image_bytes"], mime_type='image/png')
+            part = types.Part.from_bytes(data=scraped_data["image_bytes"], mime_type=scraped_data.get("mime_type") or 'image/png')
             contents.append(part)
         
-        response = client.models.generate_content(
+        response = with_retry(
+            _generate_content, client,
             model='gemini-2.5-flash',
             contents=contents,
+            retry_on=(genai_errors.ServerError, genai_errors.ClientError),
         )
         
-        raw_text = response.text.strip()
-        
         # Strip potential markdown formatting
-        if raw_text.startswith('```json'):
-            raw_text = raw_text[7:]
-        if raw_text.startswith('```'):
-            raw_text = raw_text[3:]
-        if raw_text.endswith('```'):
-            raw_text = raw_text[:-3]
-        raw_text = raw_text.strip()
+        raw_text = _FENCE_RE.sub('', response.text.strip()).strip()
         
         try:
             points_list = json.loads(raw_text)
@@ -104,21 +245,133 @@ def generate_website_pitch(scraped_data, api_key):
                 # Clean each point
                 cleaned = []
                 for pt in points_list[:3]:
-                    clean_pt = re.sub(r'[\r\n\*_~#]+', ' ', str(pt))
-                    clean_pt = re.sub(r'\s+', ' ', clean_pt).strip()
-                    cleaned.append(clean_pt)
+                    cleaned.append(_CLEAN_RE.sub(' ', str(pt)).strip())
                 return cleaned
         except json.JSONDecodeError:
             pass
             
         # Fallback: return the raw text as a single-item list
-        clean = re.sub(r'[\r\n\*_~#]+', ' ', raw_text)
-        clean = re.sub(r'\s+', ' ', clean).strip()
-        return [clean]
+        return [_CLEAN_RE.sub(' ', raw_text).strip()]
             
     except Exception as e:
         return [f"AI Generation Error: {str(e)}"]
 
+def generate_website_pitches_batch(scraped_data_list, api_key):
+    """
+    Generates pitches for several websites in a single Gemini request.
+    Returns one list of points per site, in the same order as the input.
+    Falls back to one request per site if the batched answer can't be parsed.
+    """
+    if len(scraped_data_list) == 1:
+        return [generate_website_pitch(scraped_data_list[0], api_key)]
+    
+    try:
+        client = _get_client(api_key)
+        
+        prompt = f"""
+        You are the Director of a Premium Web Development Agency. 
+        You are writing short, professional outreach pitches directly to the OWNERS of {len(scraped_data_list)} company websites.
+        For each site I am providing its number, some text content and, when available, a full-page screenshot.
+        
+        Your goal: For EACH site, identify exactly 3 specific, technical issues with the website that hurt the business, and pitch how your agency would fix each one to boost their leads and sales.
+        
+        CRITICAL RULES:
+        1. Each point MUST be a compelling, professional sentence aimed at a business owner (NOT a developer).
+        2. MAXIMUM 20 words per point. Be concise and impactful.
+        3. Focus on business impact: lost customers, slow loading, poor mobile experience, outdated design, missing trust signals, etc.
+        4. Maintain a confident, consultative, premium agency tone.
+        5. Judge each site ONLY by its own text and screenshot.
+        6. You MUST return your answer strictly as a valid JSON object mapping each site number (as a string) to an array of exactly 3 strings.
+        
+        Example:
+        {{"1": ["Point one.", "Point two.", "Point three."], "2": ["Point one.", "Point two.", "Point three."]}}
+           
+        DO NOT wrap the JSON in markdown code blocks. Just output the raw JSON object.
+        """
+        
+        contents = [prompt]
+        for site_num, scraped_data in enumerate(scraped_data_list, 1):
+            contents.append(f"Site {site_num}: Website Text: {scraped_data.get('text', '')[:2000]}")
+            if scraped_data.get("image_bytes"):
+                contents.append(f"Site {site_num} screenshot:")
+                contents.append(types.Part.from_bytes(
+                    data=scraped_data["image_bytes"],
+                    mime_type=scraped_data.get("mime_type") or 'image/png',
+                ))
+        
+        response = with_retry(
+            _generate_content, client,
+            model='gemini-2.5-flash',
+            contents=contents,
+            retry_on=(genai_errors.ServerError, genai_errors.ClientError),
+        )
+        
+        # Strip potential markdown formatting
+        raw_text = _FENCE_RE.sub('', response.text.strip()).strip()
+        
+        pitches_by_site = json.loads(raw_text)
+        results = []
+        for site_num in range(1, len(scraped_data_list) + 1):
+            points_list = pitches_by_site.get(str(site_num))
+            if not isinstance(points_list, list) or not points_list:
+                raise ValueError(f"Missing pitch for site {site_num}")
+            cleaned = []
+            for pt in points_list[:3]:
+                cleaned.append(_CLEAN_RE.sub(' ', str(pt)).strip())
+            results.append(cleaned)
+        return results
+    
+    except Exception:
+        return [generate_website_pitch(scraped_data, api_key) for scraped_data in scraped_data_list]
+
+
+def analyze_rows(rows, gemini_api_key):
+    """
+    Scrapes a batch of leads' websites and generates their pitches with one
+    Gemini call, filling in the analysis columns on each row.
+    Returns a list of (row, log messages) in input order.
+    """
+    logs_by_row = [[] for _ in rows]
+    to_pitch = []
+    
+    for i, row in enumerate(rows):
+        title = row.get('title', 'Unknown Business')
+        website = row.get('website', '')
+        
+        if not website:
+            row['Finding_1'] = "No website found."
+            row['Finding_2'] = ""
+            row['Finding_3'] = ""
+            row['Status'] = "N/A"
+            logs_by_row[i].append(f"Skipped {title}: No website.")
+            continue
+        
+        _ROW_LIMITER.acquire()
+        logs_by_row[i].append(f"📸 Capturing screenshot for {title}...")
+        scraped_data = extract_website_data(website)
+        
+        if scraped_data and (scraped_data.get("image_bytes") or scraped_data.get("text")):
+            logs_by_row[i].append(f"🤖 Analyzing {title} with Gemini Vision...")
+            to_pitch.append((i, scraped_data))
+        else:
+            row['Finding_1'] = "Could not access website."
+            row['Finding_2'] = ""
+            row['Finding_3'] = ""
+            row['Status'] = "Unreachable"
+            logs_by_row[i].append(f"❌ Failed to scrape {website}.")
+    
+    if to_pitch:
+        pitches = generate_website_pitches_batch([data for _, data in to_pitch], gemini_api_key)
+        for (i, _), points in zip(to_pitch, pitches):
+            row = rows[i]
+            row['Finding_1'] = points[0] if len(points) > 0 else ""
+            row['Finding_2'] = points[1] if len(points) > 1 else ""
+            row['Finding_3'] = points[2] if len(points) > 2 else ""
+            row['Status'] = "Pending Contact"
+            logs_by_row[i].append(f"✅ Generated pitch for {row.get('title', 'Unknown Business')}.")
+    
+    return list(zip(rows, logs_by_row))
+
 
 def analyze_csv_file(input_filepath, gemini_api_key):
     """
@@ -151,150 +404,127 @@ def analyze_csv_file(input_filepath, gemini_api_key):
             total_rows = len(rows)
             yield {"type": "log", "message": f"Found {total_rows} leads to process."}
             
-            # ── Process each row ──
-            processed_rows = []
-            processed_count = 0
-            for row in rows:
-                title = row.get('title', 'Unknown Business')
-                website = row.get('website', '')
-                
-                if not website:
-                    row['Finding_1'] = "No website found."
-                    row['Finding_2'] = ""
-                    row['Finding_3'] = ""
-                    row['Status'] = "N/A"
-                    yield {"type": "log", "message": f"Skipped {title}: No website."}
-                else:
-                    yield {"type": "log", "message": f"📸 Capturing screenshot for {title}..."}
-                    scraped_data = extract_website_data(website)
-                    
-                    if scraped_data and (scraped_data.get("image_bytes") or scraped_data.get("text")):
-                        yield {"type": "log", "message": f"🤖 Analyzing {title} with Gemini Vision..."}
-                        points = generate_website_pitch(scraped_data, gemini_api_key)
-                        row['Finding_1'] = points[0] if len(points) > 0 else ""
-                        row['Finding_2'] = points[1] if len(points) > 1 else ""
-                        row['Finding_3'] = points[2] if len(points) > 2 else ""
-                        row['Status'] = "Pending Contact"
-                        yield {"type": "log", "message": f"✅ Generated pitch for {title}."}
-                    else:
-                        row['Finding_1'] = "Could not access website."
-                        row['Finding_2'] = ""
-                        row['Finding_3'] = ""
-                        row['Status'] = "Unreachable"
-                        yield {"type": "log", "message": f"❌ Failed to scrape {website}."}
-                        
-                processed_rows.append(row)
-                processed_count += 1
-                
-                yield {
-                    "type": "progress",
-                    "count": processed_count,
-                    "total": total_rows,
-                    "latest_lead": title
-                }
-                time.sleep(1)
-            
             # ══════════════════════════════════════════════════
-            # ── BUILD STYLED EXCEL WORKBOOK ──
+            # ── SET UP STYLED EXCEL WORKBOOK ──
             # ══════════════════════════════════════════════════
-            yield {"type": "log", "message": "📊 Building styled Excel report..."}
-            
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Website Analysis"
+            # Write-only mode streams rows straight to XML instead of keeping
+            # every cell object in memory until save, so rows are written as
+            # soon as they're analyzed rather than collected first.
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet("Website Analysis")
             
-            # ── Style definitions ──
-            header_font = Font(name='Calibri', bold=True, color='FFFFFF', size=11)
-            header_fill = PatternFill(start_color='1F4E79', end_color='1F4E79', fill_type='solid')
-            header_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
-            
-            finding_fill_1 = PatternFill(start_color='FFF2CC', end_color='FFF2CC', fill_type='solid')  # Light gold
-            finding_fill_2 = PatternFill(start_color='D6E8F7', end_color='D6E8F7', fill_type='solid')  # Light blue
-            finding_fill_3 = PatternFill(start_color='E2EFDA', end_color='E2EFDA', fill_type='solid')  # Light green
-            
-            status_pending_fill = PatternFill(start_color='FCE4D6', end_color='FCE4D6', fill_type='solid')  # Light orange
-            status_na_fill = PatternFill(start_color='D9D9D9', end_color='D9D9D9', fill_type='solid')       # Light gray
-            
-            row_even_fill = PatternFill(start_color='F2F2F2', end_color='F2F2F2', fill_type='solid')
-            
-            cell_font = Font(name='Calibri', size=10)
-            finding_font = Font(name='Calibri', size=10, color='333333')
-            cell_align = Alignment(horizontal='left', vertical='top', wrap_text=True)
-            
-            thin_border = Border(
-                left=Side(style='thin', color='BFBFBF'),
-                right=Side(style='thin', color='BFBFBF'),
-                top=Side(style='thin', color='BFBFBF'),
-                bottom=Side(style='thin', color='BFBFBF')
-            )
+            # ── Column sizing (must be set before the first row is streamed) ──
+            # Only the analysis columns change during processing and they have
+            # fixed widths, so the input columns can be auto-sized upfront.
+            for col_idx, key in enumerate(fieldnames, 1):
+                # Finding columns are wider for readability
+                if key.startswith('Finding'):
+                    width = 45
+                elif key == 'Status':
+                    width = 18
+                else:
+                    max_length = len(key) + 2
+                    for row_data in rows:
+                        max_length = max(max_length, min(len(str(row_data.get(key) or '')), 50))
+                    width = max_length + 2
+                ws.column_dimensions[get_column_letter(col_idx)].width = width
             
-            # ── Write header row ──
-            for col_idx, header in enumerate(fieldnames, 1):
-                cell = ws.cell(row=1, column=col_idx, value=header.replace('_', ' ').title())
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = header_align
-                cell.border = thin_border
+            # ── Set row heights for findings to breathe ──
+            # Data rows take the sheet's default height instead of one row
+            # dimension each; only the header row is overridden.
+            ws.sheet_format.defaultRowHeight = 45
+            ws.sheet_format.customHeight = True
+            ws.row_dimensions[1].height = 25
             
             # Freeze the header row
             ws.freeze_panes = 'A2'
             
-            # ── Write data rows ──
-            finding_cols = {fn: fieldnames.index(fn) + 1 for fn in ['Finding_1', 'Finding_2', 'Finding_3'] if fn in fieldnames}
+            # ── Write header row ──
+            header_cells = []
+            for header in fieldnames:
+                cell = WriteOnlyCell(ws, value=header.replace('_', ' ').title())
+                cell.font = _HEADER_FONT
+                cell.fill = _HEADER_FILL
+                cell.alignment = _HEADER_ALIGN
+                cell.border = _THIN_BORDER
+                header_cells.append(cell)
+            ws.append(header_cells)
+            
+            # Per-column and per-status styles are looked up instead of branched on per cell
+            finding_styles = {
+                fieldnames.index(fn) + 1: (fill, _FINDING_FONT)
+                for fn, fill in zip(['Finding_1', 'Finding_2', 'Finding_3'], _FINDING_FILLS)
+                if fn in fieldnames
+            }
+            status_styles = {
+                'Pending Contact': (_STATUS_PENDING_FILL, _STATUS_PENDING_FONT),
+                'N/A': (_STATUS_NA_FILL, _STATUS_NA_FONT),
+                'Unreachable': (_STATUS_NA_FILL, _STATUS_NA_FONT),
+            }
             status_col = fieldnames.index('Status') + 1 if 'Status' in fieldnames else None
             
-            for row_idx, row_data in enumerate(processed_rows, 2):
+            def write_row(row_idx, row_data):
                 is_even = row_idx % 2 == 0
+                row_cells = []
                 for col_idx, key in enumerate(fieldnames, 1):
                     value = row_data.get(key, '')
-                    cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                    cell.font = cell_font
-                    cell.alignment = cell_align
-                    cell.border = thin_border
+                    cell = WriteOnlyCell(ws, value=value)
+                    cell.font = _CELL_FONT
+                    cell.alignment = _CELL_ALIGN
+                    cell.border = _THIN_BORDER
                     
                     # Alternate row shading for non-special columns
                     if is_even:
-                        cell.fill = row_even_fill
+                        cell.fill = _ROW_EVEN_FILL
                     
-                    # Special coloring for finding columns
-                    if col_idx == finding_cols.get('Finding_1') and value:
-                        cell.fill = finding_fill_1
-                        cell.font = finding_font
-                    elif col_idx == finding_cols.get('Finding_2') and value:
-                        cell.fill = finding_fill_2
-                        cell.font = finding_font
-                    elif col_idx == finding_cols.get('Finding_3') and value:
-                        cell.fill = finding_fill_3
-                        cell.font = finding_font
+                    # Special coloring for finding and status columns
+                    if col_idx == status_col:
+                        style = status_styles.get(value)
+                    else:
+                        style = finding_styles.get(col_idx) if value else None
+                    if style:
+                        cell.fill, cell.font = style
                     
-                    # Special coloring for status column
-                    if status_col and col_idx == status_col:
-                        if value == 'Pending Contact':
-                            cell.fill = status_pending_fill
-                            cell.font = Font(name='Calibri', size=10, bold=True, color='C65911')
-                        elif value in ('N/A', 'Unreachable'):
-                            cell.fill = status_na_fill
-                            cell.font = Font(name='Calibri', size=10, italic=True, color='808080')
+                    row_cells.append(cell)
+                ws.append(row_cells)
             
-            # ── Auto-size columns ──
-            for col_idx, key in enumerate(fieldnames, 1):
-                max_length = len(key) + 2
-                for row_idx in range(2, len(processed_rows) + 2):
-                    cell_value = str(ws.cell(row=row_idx, column=col_idx).value or '')
-                    max_length = max(max_length, min(len(cell_value), 50))
-                
-                # Finding columns are wider for readability
-                if key.startswith('Finding'):
-                    ws.column_dimensions[ws.cell(row=1, column=col_idx).column_letter].width = 45
-                elif key == 'Status':
-                    ws.column_dimensions[ws.cell(row=1, column=col_idx).column_letter].width = 18
-                else:
-                    ws.column_dimensions[ws.cell(row=1, column=col_idx).column_letter].width = max_length + 2
+            # ── Process rows concurrently, a batch of leads per Gemini call ──
+            # Batches are submitted lazily, ANALYZER_MAX_WORKERS at a time, so a client
+            # that disconnects (or a batch that fails) stops new Microlink/Gemini work;
+            # closing `batches` only waits for the ones already in flight.
+            # Batches finish out of order; finished rows wait in `pending` only
+            # until every row before them has been written, keeping CSV order.
+            pending = {}
+            next_idx = 0
+            processed_count = 0
+            batches = imap_bounded(
+                lambda start: analyze_rows(rows[start:start + PITCH_BATCH_SIZE], gemini_api_key),
+                range(0, total_rows, PITCH_BATCH_SIZE),
+                ANALYZER_MAX_WORKERS,
+            )
+            try:
+                for start, future in batches:
+                    for offset, (row, logs) in enumerate(future.result()):
+                        pending[start + offset] = row
+                        processed_count += 1
+                        
+                        for message in logs:
+                            yield {"type": "log", "message": message}
+                        
+                        yield {
+                            "type": "progress",
+                            "count": processed_count,
+                            "total": total_rows,
+                            "latest_lead": row.get('title', 'Unknown Business')
+                        }
+                    
+                    while next_idx in pending:
+                        write_row(next_idx + 2, pending.pop(next_idx))
+                        next_idx += 1
+            finally:
+                batches.close()
             
-            # ── Set row heights for findings to breathe ──
-            for row_idx in range(2, len(processed_rows) + 2):
-                ws.row_dimensions[row_idx].height = 45
-            ws.row_dimensions[1].height = 25
+            yield {"type": "log", "message": "📊 Saving styled Excel report..."}
             
             # ── Save the workbook ──
             wb.save(output_filepath)
@@ -1,15 +1,30 @@
 import os
 import json
 import time
-from flask import Flask, render_template, request, Response, jsonify, send_file
+import queue
+import threading
+import unicodedata
+from urllib.parse import quote
+from flask import Flask, render_template, request, Response, jsonify, make_response, send_from_directory
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 import uuid
 from scraper import generate_leads
-from scraper_linkedin import generate_linkedin_leads
+from scraper_linkedin import SMART_CAMPAIGN_PREFIX, build_linkedin_xlsx, generate_linkedin_leads
 from scraper_b2b import generate_b2b_partners
 from analyzer import analyze_csv_file
 
+try:
+    import orjson
+
+    def _dump(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    def _dump(obj):
+        return json.dumps(obj)
+
 # Load environment variables
 load_dotenv('.env.local')
 api_key = os.getenv("SERPAPI_KEY")
@@ -27,6 +42,57 @@ UPLOAD_FOLDER = os.path.join(app.root_path, 'generated_leads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# When served behind nginx, set this to an internal location aliased to generated_leads/
+# (e.g. "/_protected_leads/") so nginx sends downloads itself instead of the worker.
+ACCEL_REDIRECT_PREFIX = os.getenv("ACCEL_REDIRECT_PREFIX", "")
+
+# Seconds of silence before a keepalive comment is sent, so proxies don't drop the stream
+SSE_HEARTBEAT_SECS = 15
+
+def sse_stream(gen_factory):
+    """
+    Runs an event generator on a background thread and relays its events as SSE.
+    The request thread only drains a bounded queue, sending a ': ping' comment
+    whenever the generator is quiet for SSE_HEARTBEAT_SECS.
+    """
+    events = queue.Queue(maxsize=64)
+    stopped = threading.Event()
+    
+    def put(item):
+        # Give up once the client has gone away instead of blocking forever on a full queue
+        while not stopped.is_set():
+            try:
+                events.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def worker():
+        try:
+            for event in gen_factory():
+                if not put(event):
+                    return
+        except Exception as e:
+            put({'type': 'error', 'message': str(e)})
+        put(None)
+    
+    threading.Thread(target=worker, daemon=True).start()
+    
+    try:
+        while True:
+            try:
+                event = events.get(timeout=SSE_HEARTBEAT_SECS)
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            if event is None:
+                break
+            # SSE dictates messages start with 'data: ' and end with two newlines
+            yield f"data: {_dump(event)}\n\n"
+    finally:
+        stopped.set()
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -46,6 +112,7 @@ def generate():
     
     require_email = request.args.get('require_email', 'false').lower() == 'true'
     require_website = request.args.get('require_website', 'false').lower() == 'true'
+    scrape_emails = request.args.get('scrape_emails', 'true').lower() == 'true'
     user_api_key = request.args.get('api_key', '').strip()
     
     # Use user provided key if exists, otherwise fallback to system
@@ -57,15 +124,10 @@ def generate():
     if not final_api_key:
         return jsonify({"error": "No SerpAPI key provided! Please enter one in the UI or set it in .env.local"}), 400
 
-    def generate_events():
-        try:
-            for event in generate_leads(keyword, location, limit, final_api_key, require_email, require_website):
-                # SSE dictates messages start with 'data: ' and end with two newlines
-                yield f"data: {json.dumps(event)}\n\n"
-        except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
-            
-    return Response(generate_events(), mimetype='text/event-stream')
+    return Response(
+        sse_stream(lambda: generate_leads(keyword, location, limit, final_api_key, require_email, require_website, scrape_emails)),
+        mimetype='text/event-stream'
+    )
 
 @app.route('/generate_linkedin')
 def generate_linkedin():
@@ -89,14 +151,10 @@ def generate_linkedin():
     if not gemini_key:
         return jsonify({"error": "No Gemini API key provided! Please enter it in the UI or set GEMINI_API_KEY in .env.local"}), 400
 
-    def generate_events():
-        try:
-            for event in generate_linkedin_leads(goal, location, limit, final_api_key, gemini_key):
-                yield f"data: {json.dumps(event)}\n\n"
-        except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
-            
-    return Response(generate_events(), mimetype='text/event-stream')
+    return Response(
+        sse_stream(lambda: generate_linkedin_leads(goal, location, limit, final_api_key, gemini_key)),
+        mimetype='text/event-stream'
+    )
 
 @app.route('/generate_b2b')
 def generate_b2b():
@@ -116,14 +174,10 @@ def generate_b2b():
     if not final_api_key:
         return jsonify({"error": "No SerpAPI key provided! Please enter it in the UI or set SERPAPI_KEY in .env.local"}), 400
 
-    def generate_events():
-        try:
-            for event in generate_b2b_partners(keyword, location, limit, final_api_key):
-                yield f"data: {json.dumps(event)}\n\n"
-        except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
-            
-    return Response(generate_events(), mimetype='text/event-stream')
+    return Response(
+        sse_stream(lambda: generate_b2b_partners(keyword, location, limit, final_api_key)),
+        mimetype='text/event-stream'
+    )
 
 @app.route('/upload_csv', methods=['POST'])
 def upload_csv():
@@ -155,23 +209,50 @@ def analyze():
         
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
     
-    def analyze_events():
-        try:
-            for event in analyze_csv_file(filepath, gemini_key):
-                yield f"data: {json.dumps(event)}\n\n"
-        except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
-            
-    return Response(analyze_events(), mimetype='text/event-stream')
+    return Response(
+        sse_stream(lambda: analyze_csv_file(filepath, gemini_key)),
+        mimetype='text/event-stream'
+    )
+
+def _attachment_disposition(name):
+    """
+    Content-Disposition options for downloading `name`, quoted the way send_file does it:
+    non-ASCII names get an ASCII fallback plus an RFC 6266 filename* with the real name.
+    """
+    try:
+        name.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simple, 'filename*': "UTF-8''" + quote(name, safe="!#$&+^`|~")}
+    return {'filename': name}
 
 @app.route('/download/<path:filename>')
 def download(filename):
     # Ensure it only downloads from generated_leads
-    safe_path = os.path.join(app.root_path, 'generated_leads', filename)
-    if os.path.exists(safe_path) and os.path.isfile(safe_path):
-        return send_file(safe_path, as_attachment=True)
-    return "File not found", 404
+    safe_path = safe_join(app.config['UPLOAD_FOLDER'], filename)
+    # Smart Campaign reports are saved as CSV; their XLSX is built on first download
+    if (safe_path and safe_path.endswith('.xlsx') and not os.path.isfile(safe_path)
+            and os.path.basename(safe_path).startswith(SMART_CAMPAIGN_PREFIX)):
+        try:
+            build_linkedin_xlsx(safe_path)
+        except Exception as e:
+            return f"Excel generation failed: {str(e)}", 500
+    if not safe_path or not os.path.isfile(safe_path):
+        return "File not found", 404
+    
+    if ACCEL_REDIRECT_PREFIX:
+        resp = make_response('')
+        # nginx decodes the redirect URI, so names with spaces, quotes or non-ASCII characters are percent-encoded
+        resp.headers['X-Accel-Redirect'] = ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(filename)
+        resp.headers.set('Content-Disposition', 'attachment', **_attachment_disposition(os.path.basename(filename)))
+        return resp
+    
+    try:
+        return send_from_directory(app.config['UPLOAD_FOLDER'], filename, as_attachment=True, conditional=True)
+    except NotFound:
+        return "File not found", 404
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 8000))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    debug = os.environ.get("FLASK_DEBUG", "").lower() in ("1", "true")
+    app.run(host='0.0.0.0', port=port, debug=debug, threaded=True)
@@ -1,13 +1,13 @@
 import os
 import csv
 import re
-import requests
+import hashlib
 from bs4 import BeautifulSoup
-from serpapi import GoogleSearch
 from dotenv import load_dotenv
 import sys
 import logging
-import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http_utils import DiskCache, RateLimiter, fetch_html, find_emails, make_session, serpapi_search
 
 sys.stdout.reconfigure(encoding='utf-8')
 logging.basicConfig(
@@ -26,85 +26,116 @@ if not api_key:
     api_key = os.getenv("SERPAPI_KEY")
 
 FOLDER = "wellness_gym_leads"
+MAX_WORKERS = 16
+
+# Shared across worker threads: one connection pool for page scrapes and one
+# pacing limiter so parallel rows stay under SerpAPI's request rate.
+SESSION = make_session(pool_size=MAX_WORKERS * 2,
+                       user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+                       retries=2)
+SERP_LIMITER = RateLimiter(2.0)
+# Every search is billable, so results (including "no email found") are kept for a week
+SERP_CACHE = DiskCache(os.path.join('.cache', 'serp_emails.sqlite'), ttl=7 * 24 * 60 * 60)
+
+EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp')
+JUNK_EMAIL_PARTS = ('example.com', 'yourdomain', 'sentry.io', 'wixpress.com', 'google.com',
+                    'email.com', 'website.com', 'test.com', 'domain.com', 'placeholder')
+# Each blocklist is one compiled alternation, so a candidate is checked in a single
+# C-level scan instead of one Python-level substring test per entry
+JUNK_EMAIL_RE = re.compile('|'.join(map(re.escape, JUNK_EMAIL_PARTS)))
+SOCIAL_LINK_RE = re.compile('|'.join(map(re.escape, (
+    'facebook.com', 'instagram.com', 'youtube.com', 'twitter.com', 'linkedin.com'))))
 
 def extract_emails_from_text(text):
-    pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-    emails = set(re.findall(pattern, text))
-    junk = ['example.com', 'yourdomain', 'sentry.io', 'wixpress.com', 'google.com',
-            'email.com', 'website.com', 'test.com', 'domain.com', 'placeholder']
-    valid = {e for e in emails if len(e) < 50
-             and not any(ext in e.lower() for ext in ['.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp'])
-             and not any(x in e.lower() for x in junk)}
+    valid = set()
+    for e in set(find_emails(EMAIL_RE, text)):
+        el = e.lower()
+        if (len(e) < 50
+                and not el.endswith(IMAGE_EXTS)
+                and not JUNK_EMAIL_RE.search(el)):
+            valid.add(e)
     return valid
 
 def search_email_google(business_name, city):
-    """Use Google Search to find email for a business."""
-    query = f'"{business_name}" {city} email contact'
+    """Use Google Search to find email for a business, reusing cached answers."""
+    key = hashlib.sha1(f"{business_name.lower().strip()}|{city.lower().strip()}".encode()).hexdigest()
+    cached = SERP_CACHE.get(key)
+    if cached is not None:
+        return cached
     try:
-        params = {
-            "engine": "google",
-            "q": query,
-            "api_key": api_key,
-            "num": 5
-        }
-        search = GoogleSearch(params)
-        results = search.get_dict()
-
-        all_text = ""
-        # Check snippets from organic results
-        for r in results.get("organic_results", []):
-            snippet = r.get("snippet", "")
-            all_text += " " + snippet
-            # Also check rich snippet / about_this_result
-            rich = r.get("rich_snippet", {})
-            if rich:
-                for k, v in rich.items():
-                    if isinstance(v, dict):
-                        for kk, vv in v.items():
-                            if isinstance(vv, str):
-                                all_text += " " + vv
-                    elif isinstance(v, str):
+        email = _lookup_email(business_name, city)
+    except Exception as e:
+        # Failed searches aren't cached so a rerun tries them again
+        logging.error(f"Search error: {str(e)[:60]}")
+        return ""
+    SERP_CACHE.set(key, email)
+    return email
+
+def _lookup_email(business_name, city):
+    """Runs the SerpAPI search and page-scrape fallback; errors propagate to the caller."""
+    query = f'"{business_name}" {city} email contact'
+    params = {
+        "engine": "google",
+        "q": query,
+        "api_key": api_key,
+        "num": 5
+    }
+    results = serpapi_search(SESSION, params, SERP_LIMITER)
+
+    all_text = ""
+    # Check snippets from organic results
+    for r in results.get("organic_results", []):
+        snippet = r.get("snippet", "")
+        all_text += " " + snippet
+        # Also check rich snippet / about_this_result
+        rich = r.get("rich_snippet", {})
+        if rich:
+            for k, v in rich.items():
+                if isinstance(v, dict):
+                    for kk, vv in v.items():
+                        if isinstance(vv, str):
+                            all_text += " " + vv
+                elif isinstance(v, str):
+                    all_text += " " + v
+
+    # Check knowledge graph
+    kg = results.get("knowledge_graph", {})
+    if kg:
+        for key in ['email', 'description', 'snippet']:
+            if key in kg and isinstance(kg[key], str):
+                all_text += " " + kg[key]
+        # Check attributes
+        for attr_key in ['attributes', 'known_attributes']:
+            attrs = kg.get(attr_key, {})
+            if isinstance(attrs, dict):
+                for k, v in attrs.items():
+                    if isinstance(v, str):
                         all_text += " " + v
 
-        # Check knowledge graph
-        kg = results.get("knowledge_graph", {})
-        if kg:
-            for key in ['email', 'description', 'snippet']:
-                if key in kg and isinstance(kg[key], str):
-                    all_text += " " + kg[key]
-            # Check attributes
-            for attr_key in ['attributes', 'known_attributes']:
-                attrs = kg.get(attr_key, {})
-                if isinstance(attrs, dict):
-                    for k, v in attrs.items():
-                        if isinstance(v, str):
-                            all_text += " " + v
-
-        emails = extract_emails_from_text(all_text)
-        if emails:
-            return ", ".join(emails)
-
-        # Try scraping the first organic result page
-        for r in results.get("organic_results", [])[:2]:
-            link = r.get("link", "")
-            if link and not any(x in link for x in ['facebook.com', 'instagram.com', 'youtube.com', 'twitter.com', 'linkedin.com']):
-                try:
-                    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-                    resp = requests.get(link, headers=headers, timeout=8)
-                    if resp.status_code == 200:
-                        soup = BeautifulSoup(resp.text, 'html.parser')
-                        page_emails = extract_emails_from_text(soup.get_text(separator=' '))
-                        # mailto
-                        for a in soup.find_all('a', href=True):
-                            if a['href'].startswith('mailto:'):
-                                page_emails.add(a['href'].replace('mailto:', '').split('?')[0].strip())
-                        if page_emails:
-                            return ", ".join(page_emails)
-                except:
-                    pass
+    emails = extract_emails_from_text(all_text)
+    if emails:
+        return ", ".join(emails)
+
+    # Try scraping the first organic result page
+    for r in results.get("organic_results", [])[:2]:
+        link = r.get("link", "")
+        if link and not SOCIAL_LINK_RE.search(link):
+            try:
+                # Capped, streamed download that skips PDFs and other non-HTML results
+                html = fetch_html(SESSION, link, timeout=8)
+                if html is not None:
+                    soup = BeautifulSoup(html, 'lxml')
+                    page_emails = extract_emails_from_text(soup.get_text(separator=' '))
+                    # mailto
+                    for a in soup.find_all('a', href=True):
+                        if a['href'].startswith('mailto:'):
+                            page_emails.add(a['href'].replace('mailto:', '').split('?')[0].strip())
+                    if page_emails:
+                        return ", ".join(page_emails)
+            except:
+                pass
 
-    except Exception as e:
-        logging.error(f"Search error: {str(e)[:60]}")
     return ""
 
 def process_csv(filename):
@@ -112,13 +143,25 @@ def process_csv(filename):
     if not os.path.exists(filepath):
         return
 
-    rows = []
-    with open(filepath, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        fieldnames = reader.fieldnames
+    # Rows stay plain lists and columns are read by index, instead of building a dict per row
+    with open(filepath, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
         rows = list(reader)
-
-    missing = [i for i, r in enumerate(rows) if not r.get('email', '').strip()]
+    if 'email' not in header:
+        header.append('email')
+    width = len(header)
+    for row in rows:
+        if len(row) < width:
+            row.extend([''] * (width - len(row)))
+    email_col = header.index('email')
+    columns = {name: i for i, name in enumerate(header)}
+
+    def cell(row, name):
+        i = columns.get(name)
+        return row[i] if i is not None else ''
+
+    missing = [i for i, row in enumerate(rows) if not row[email_col].strip()]
     logging.info(f"\n{'='*50}")
     logging.info(f"{filename}: {len(rows)} leads, {len(missing)} missing emails")
 
@@ -126,24 +169,25 @@ def process_csv(filename):
         return 0
 
     found_count = 0
-    for idx in missing:
-        row = rows[idx]
-        title = row.get('title', '')
-        city = row.get('city', '')
-
-        logging.info(f"  [{idx+1}] Searching: {title}")
-        email = search_email_google(title, city)
-        if email:
-            rows[idx]['email'] = email
-            found_count += 1
-            logging.info(f"    FOUND: {email}")
-        else:
-            logging.info(f"    Not found")
-        time.sleep(0.5)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {
+            executor.submit(search_email_google, cell(rows[idx], 'title'), cell(rows[idx], 'city')): idx
+            for idx in missing
+        }
+        for future in as_completed(futures):
+            idx = futures[future]
+            title = cell(rows[idx], 'title')
+            email = future.result()
+            if email:
+                rows[idx][email_col] = email
+                found_count += 1
+                logging.info(f"  [{idx+1}] {title} -> FOUND: {email}")
+            else:
+                logging.info(f"  [{idx+1}] {title} -> Not found")
 
     with open(filepath, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
+        writer = csv.writer(f)
+        writer.writerow(header)
         writer.writerows(rows)
 
     logging.info(f"Updated {filename}: Found {found_count}/{len(missing)} emails via Google Search")
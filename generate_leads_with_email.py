@@ -1,13 +1,16 @@
 import os
-import csv
-import time
 import re
-import requests
-from bs4 import BeautifulSoup
-from serpapi import GoogleSearch
-from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor
+import time
+import threading
+import lxml.html
+from lxml.etree import ParserError
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse
+from http_utils import enable_dns_cache, fetch_html, find_emails, is_blocked_email, make_session, page_key
+from leads_core import (
+    HYDROGEN_REJECT_TYPES, MANUFACTURER_LOCATIONS, MANUFACTURER_QUERIES,
+    VENDOR_LOCATIONS, VENDOR_QUERIES, append_lead, append_leads, fetch_leads as search_leads, load_api_key, scan_existing,
+)
 import sys
 import logging
 
@@ -24,190 +27,193 @@ logging.basicConfig(
     ]
 )
 
-# Load environment variables
-load_dotenv('.env.local')
-
-api_key = os.getenv("SERPAPI_KEY")
-
-if not api_key:
-    load_dotenv('.env')
-    api_key = os.getenv("SERPAPI_KEY")
+api_key = load_api_key()
 
 if not api_key:
     print("Error: SERPAPI_KEY not found in .env.local or .env")
-    exit(1)
+    sys.exit(1)
+
+OUTPUT_DIR = "hydrogen_leads"
+
+# Patterns and filters are compiled/built once instead of on every page
+EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+CONTACT_RE = re.compile(r'contact', re.I)
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp')
 
 def extract_emails_from_text(text):
-    """Extract emails from text using regex"""
-    # Improved regex to avoid some junk
-    email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-    emails = set(re.findall(email_pattern, text))
-    # Filter out invalid emails that might be image filenames or too long
-    valid_emails = {e for e in emails if len(e) < 50 and not any(ext in e.lower() for ext in ['.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp'])}
+    """Extract emails from text using regex, dropping image filenames, overlong matches and placeholder domains"""
+    valid_emails = set()
+    for e in set(find_emails(EMAIL_RE, text)):
+        lower = e.lower()
+        if (len(e) < 50 and not lower.endswith(IMAGE_SUFFIXES)
+                and not is_blocked_email(lower)):
+            valid_emails.add(e)
     return valid_emails
 
+# Website scrapes run alongside the SerpAPI searches. All workers share one
+# pooled Session, so a lead's homepage and contact page reuse one connection.
+SCRAPE_WORKERS = 16
+# Contact pages fetched speculatively while each homepage loads, on their own pool
+SPECULATIVE_PATHS = ('/contact', '/contact-us', '/about')
+_page_pool = ThreadPoolExecutor(max_workers=SCRAPE_WORKERS * len(SPECULATIVE_PATHS))
+SESSION = make_session(
+    pool_size=SCRAPE_WORKERS * (1 + len(SPECULATIVE_PATHS)),
+    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    retries=2,
+    max_redirects=5,
+)
+# New connections to a host already looked up (parallel page fetches, retries) skip DNS
+enable_dns_cache()
+
+# fetch_html has already decoded pages, so they're parsed as UTF-8 bytes with the encoding
+# fixed (lxml refuses str input that starts with an XML encoding declaration)
+_HTML_PARSER = lxml.html.HTMLParser(encoding='utf-8')
+
+def _emails_in_html(html):
+    """
+    Find emails in a page, returning (emails, contact_hrefs). The raw HTML is searched
+    first, since emails almost always appear verbatim; the page is only parsed (with
+    lxml directly, no BeautifulSoup tree) when that finds nothing, and the contact
+    links found during the parse are returned for the contact-page fallback.
+    """
+    emails = extract_emails_from_text(html)
+    if emails:
+        return emails, []
+    try:
+        tree = lxml.html.fromstring(html.encode('utf-8'), parser=_HTML_PARSER)
+    except ParserError:
+        return emails, []
+    # Join text nodes with spaces to avoid concatenated text like "info@kykindia.comHomeAbout"
+    text = ' '.join(tree.itertext())
+    emails = extract_emails_from_text(text)
+    contact_hrefs = [href for href in tree.xpath('//a/@href') if CONTACT_RE.search(href)]
+    return emails, contact_hrefs
+
+# Scrape result per website URL (see page_key), so leads of a chain or franchise listing
+# the same site fetch it once, while businesses with their own page on a shared host
+# (facebook.com/x, sites.google.com/view/y) are scraped separately. Entries hold a Future,
+# so a scrape already in flight is waited on rather than repeated; sites with no email
+# are retried after EMPTY_SITE_TTL seconds.
+EMPTY_SITE_TTL = 60 * 60
+_email_by_site = {}
+_email_by_site_lock = threading.Lock()
+
 def scrape_email_from_website(url):
-    """Scrape emails from a website"""
+    """Scrape emails from a website, reusing the result for other leads with the same website"""
     if not url:
         return ""
     
+    # Add http if missing
+    if not url.startswith('http'):
+        url = 'http://' + url
+    
+    key = page_key(url)
+    with _email_by_site_lock:
+        entry = _email_by_site.get(key)
+        stale = entry is not None and entry[0].done() and not entry[0].result() and time.time() - entry[1] > EMPTY_SITE_TTL
+        owner = entry is None or stale
+        if owner:
+            entry = _email_by_site[key] = (Future(), time.time())
+    
+    if owner:
+        result = ""
+        try:
+            result = _scrape_emails(url)
+        finally:
+            entry[0].set_result(result)
+    return entry[0].result()
+
+def _fetch_emails(url, timeout):
+    """Emails on a single page, or an empty set if it can't be fetched"""
+    try:
+        html = fetch_html(SESSION, url, timeout=timeout)
+    except Exception:
+        return set()
+    return _emails_in_html(html)[0] if html is not None else set()
+
+def _scrape_emails(url):
+    """Fetch a site's homepage (and contact pages if needed) and return its emails, comma-separated"""
+    parts = urlparse(url)
+    base_url = f"{parts.scheme}://{parts.netloc}"
+    # The usual contact pages are requested alongside the homepage rather than after it,
+    # so a homepage without an email doesn't cost a second round trip. They take the
+    # host's MAX_PER_HOST slots, so the homepage itself skips that queue.
+    speculative = {
+        base_url + path: _page_pool.submit(_fetch_emails, base_url + path, 5)
+        for path in SPECULATIVE_PATHS
+    }
     try:
-        # Add http if missing
-        if not url.startswith('http'):
-            url = 'http://' + url
-            
         logging.info(f"Scraping emails from {url}...")
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        response = requests.get(url, headers=headers, timeout=10)
+        html = fetch_html(SESSION, url, timeout=10, host_limited=False)
         
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            # Use separator to avoid concatenated text like "info@kykindia.comHomeAbout"
-            text = soup.get_text(separator=' ')
-            emails = extract_emails_from_text(text)
+        if html is not None:
+            emails, contact_hrefs = _emails_in_html(html)
+            
+            # Take emails from whichever speculative page answers first with some
+            if not emails:
+                for future in as_completed(speculative.values()):
+                    emails.update(future.result())
+                    if emails:
+                        break
             
             # Also check contact page if found
             if not emails:
-                contact_links = soup.find_all('a', href=re.compile(r'contact', re.I))
-                for link in contact_links:
-                    contact_url = link.get('href')
+                for contact_url in contact_hrefs:
                     if contact_url:
                         if not contact_url.startswith('http'):
-                            base_url = f"{urlparse(url).scheme}://{urlparse(url).netloc}"
                             contact_url = base_url + contact_url if contact_url.startswith('/') else base_url + '/' + contact_url
                         
-                        try:
-                            contact_response = requests.get(contact_url, headers=headers, timeout=5)
-                            if contact_response.status_code == 200:
-                                contact_soup = BeautifulSoup(contact_response.text, 'html.parser')
-                                emails.update(extract_emails_from_text(contact_soup.get_text(separator=' ')))
-                        except:
-                            pass
-            
-            filtered_emails = {e for e in emails if not any(x in e.lower() for x in ['example.com', 'yourdomain', 'sentry.io', 'wixpress.com'])}
+                        if contact_url not in speculative:
+                            emails.update(_fetch_emails(contact_url, 5))
             
-            if filtered_emails:
-                result = ", ".join(filtered_emails)
+            if emails:
+                result = ", ".join(emails)
                 logging.info(f"Found: {result}")
                 return result
     except Exception as e:
         logging.error(f"Scrape error: {str(e)[:50]}")
         pass
+    finally:
+        # Speculative fetches that haven't started yet are no longer needed
+        for future in speculative.values():
+            future.cancel()
         
     return ""
 
 def save_lead_incrementally(lead, filename):
-    """Append a single lead to CSV"""
-    output_path = os.path.join("hydrogen_leads", filename)
-    file_exists = os.path.isfile(output_path)
-    
-    with open(output_path, 'a', newline='', encoding='utf-8') as output_file:
-        dict_writer = csv.DictWriter(output_file, fieldnames=lead.keys())
-        if not file_exists:
-            dict_writer.writeheader()
-        dict_writer.writerow(lead)
+    """Append a single lead to CSV (safe to call from scrape workers)"""
+    append_lead(lead, os.path.join(OUTPUT_DIR, filename))
+
+def scrape_and_save_lead(lead, filename):
+    """Fill in the lead's email from its website, then append it to the CSV"""
+    lead["email"] = scrape_email_from_website(lead["website"])
+    save_lead_incrementally(lead, filename)
 
 def fetch_leads(base_queries, locations, city, limit, category, filename):
     """
     Fetch leads using SerpAPI Google Maps search and save incrementally.
+    Returns only the leads found in this run; ones already in the file are skipped.
     """
-    leads = []
-    seen_identifiers = set()
-    output_path = os.path.join("hydrogen_leads", filename)
-    
-    # Check if file exists and load seen identifiers to avoid duplicates on restart
-    if os.path.exists(output_path):
-        try:
-            with open(output_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    phone = row.get("phone")
-                    title = row.get("title")
-                    address = row.get("address")
-                    dedup_key = phone if phone else (f"{title}|{address}" if address else title)
-                    if dedup_key:
-                        seen_identifiers.add(dedup_key)
-                        leads.append(row) # Keep count correct
-            logging.info(f"Resuming {filename}: Found {len(leads)} existing leads.")
-        except Exception as e:
-            logging.error(f"Error reading existing file: {e}")
+    # Load seen identifiers from an existing file to avoid duplicates on restart
+    seen_identifiers, existing = scan_existing(os.path.join(OUTPUT_DIR, filename))
 
-    for location in locations:
-        if len(leads) >= limit:
-            break
-            
-        for query_base in base_queries:
-            if len(leads) >= limit:
-                break
-                
-            query = f"{query_base} {location}"
-            logging.info(f"Searching: {query}")
-            
-            params = {
-                "engine": "google_maps",
-                "q": query,
-                "type": "search",
-                "api_key": api_key,
-                "start": 0
-            }
-            
-            try:
-                search = GoogleSearch(params)
-                results = search.get_dict()
-                local_results = results.get("local_results", [])
-                
-                if not local_results:
-                    logging.info(f"No results found")
-                    continue
-                
-                new_count = 0
-                for result in local_results:
-                    if len(leads) >= limit:
-                        break
-                        
-                    title = result.get("title")
-                    phone = result.get("phone")
-                    address = result.get("address")
-                    website = result.get("website")
-                    
-                    # Deduplicate by phone or title+address
-                    dedup_key = phone if phone else (f"{title}|{address}" if address else title)
-                    
-                    if dedup_key and dedup_key not in seen_identifiers:
-                        seen_identifiers.add(dedup_key)
-                        
-                        # Scrape email if website exists
-                        email = ""
-                        if website:
-                            email = scrape_email_from_website(website)
-                        
-                        lead = {
-                            "title": title,
-                            "address": address,
-                            "phone": phone,
-                            "website": website,
-                            "email": email,
-                            "rating": result.get("rating"),
-                            "reviews": result.get("reviews"),
-                            "type": result.get("type"),
-                            "category": category,
-                            "source_query": query,
-                            "city": city
-                        }
-                        
-                        leads.append(lead)
-                        save_lead_incrementally(lead, filename)
-                        new_count += 1
-                
-                if new_count > 0:
-                    logging.info(f"Added {new_count} | Total: {len(leads)}/{limit}")
-                time.sleep(0.5)
-                
-            except Exception as e:
-                logging.error(f"Error: {e}")
-                time.sleep(1)
-    
-    return leads
+    def on_page(new_leads):
+        # Scrape email off the search loop if website exists; the lead is saved once it's done.
+        # Leads without one are saved straight away, a page's worth in one write.
+        no_website = []
+        for lead in new_leads:
+            if lead["website"]:
+                scrape_pool.submit(scrape_and_save_lead, lead, filename)
+            else:
+                no_website.append(lead)
+        append_leads(no_website, os.path.join(OUTPUT_DIR, filename))
+
+    # Leaving the scrape pool waits for every pending website scrape to finish and be saved
+    with ThreadPoolExecutor(max_workers=SCRAPE_WORKERS) as scrape_pool:
+        return search_leads(base_queries, locations, city, limit, api_key, category,
+                            with_email=True, seen_identifiers=seen_identifiers,
+                            existing=existing, on_page=on_page,
+                            reject_types=HYDROGEN_REJECT_TYPES)
 
 def get_manufacturer_leads(city, limit=100):
     """
@@ -215,28 +221,8 @@ def get_manufacturer_leads(city, limit=100):
     """
     logging.info(f"MANUFACTURERS - {city.upper()}")
     
-    # Manufacturer-specific queries
-    base_queries = [
-        "Hydrogen water machine manufacturer",
-        "Alkaline water ionizer manufacturer",
-        "Water ionizer manufacturer",
-        "Hydrogen water bottle manufacturer",
-        "Water purification equipment manufacturer",
-        "Electrolysis water machine manufacturer",
-        "Hydrogen generator manufacturer",
-        "Industrial water equipment manufacturer",
-        "Water treatment equipment manufacturer",
-        "Alkaline water machine factory",
-    ]
-    
-    # Location variations
-    if city == "Mumbai":
-        locations = [city, f"{city} Andheri", f"{city} Borivali", "Thane", "Navi Mumbai", f"{city} Goregaon"]
-    else:
-        locations = [city, f"{city} Kothrud", f"{city} Wakad", f"{city} Hadapsar", "Pimpri Chinchwad", f"{city} Hinjewadi"]
-    
     filename = "mumbai_manufacturers.csv" if city == "Mumbai" else "pune_manufacturers.csv"
-    return fetch_leads(base_queries, locations, city, limit, "MANUFACTURER", filename)
+    return fetch_leads(MANUFACTURER_QUERIES, MANUFACTURER_LOCATIONS[city], city, limit, "MANUFACTURER", filename)
 
 def get_vendor_leads(city, limit=100):
     """
@@ -244,30 +230,8 @@ def get_vendor_leads(city, limit=100):
     """
     logging.info(f"VENDORS/DEALERS - {city.upper()}")
     
-    # Vendor/dealer-specific queries
-    base_queries = [
-        "Hydrogen water machine dealer",
-        "Hydrogen water machine vendor",
-        "Hydrogen water machine supplier",
-        "Kangen water distributor",
-        "Enagic distributor",
-        "Alkaline water ionizer dealer",
-        "Hydrogen water ionizer dealer",
-        "Water ionizer supplier",
-        "Alkaline water machine dealer",
-        "Hydrogen water equipment supplier",
-        "Kangen water seller",
-        "Water purifier dealer",
-    ]
-    
-    # Location variations
-    if city == "Mumbai":
-        locations = [city, f"{city} Bandra", f"{city} Malad", f"{city} Powai", f"{city} Kurla", "Navi Mumbai", f"{city} Kandivali"]
-    else:
-        locations = [city, f"{city} Baner", f"{city} Viman Nagar", f"{city} Aundh", f"{city} Koregaon Park", "Pimpri Chinchwad", f"{city} Magarpatta"]
-        
     filename = "mumbai_vendors.csv" if city == "Mumbai" else "pune_vendors.csv"
-    return fetch_leads(base_queries, locations, city, limit, "VENDOR", filename)
+    return fetch_leads(VENDOR_QUERIES, VENDOR_LOCATIONS[city], city, limit, "VENDOR", filename)
 
 if __name__ == "__main__":
     logging.info("HYDROGEN WATER MACHINE LEADS - 400 UNIQUE LEADS WITH EMAILS")
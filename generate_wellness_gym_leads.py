@@ -1,12 +1,10 @@
 import os
-import csv
-import time
 import re
-import requests
 from bs4 import BeautifulSoup
-from serpapi import GoogleSearch
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from http_utils import BLOCKED_EMAIL_DOMAINS, enable_dns_cache, fetch_html, find_emails, is_blocked_email, make_session
 from urllib.parse import urlparse
+from leads_core import append_lead, append_leads, fetch_leads as search_leads, load_api_key, scan_existing
 import sys
 import logging
 
@@ -23,24 +21,38 @@ logging.basicConfig(
     ]
 )
 
-# Load environment variables
-load_dotenv('.env.local')
-api_key = os.getenv("SERPAPI_KEY")
-if not api_key:
-    load_dotenv('.env')
-    api_key = os.getenv("SERPAPI_KEY")
+api_key = load_api_key()
 if not api_key:
     print("Error: SERPAPI_KEY not found")
-    exit(1)
+    sys.exit(1)
 
 OUTPUT_DIR = "wellness_gym_leads"
 
+# Website scrapes run on a pool alongside the SerpAPI searches, this many at once
+SCRAPE_WORKERS = 20
+# One keep-alive pool for every scrape, so a contact page reuses the homepage's connection
+SESSION = make_session(
+    pool_size=64,
+    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    retries=2,
+)
+# New connections to a host already looked up (parallel page fetches, retries) skip DNS
+enable_dns_cache()
+
+# Patterns are compiled once instead of on every page
+EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+CONTACT_RE = re.compile(r'contact', re.I)
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp')
+# Google addresses on a gym's pages are the Maps/Analytics embeds, not the business
+BLOCKED_DOMAINS = BLOCKED_EMAIL_DOMAINS + ('.google.com',)
+
 def extract_emails_from_text(text):
-    email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-    emails = set(re.findall(email_pattern, text))
-    valid_emails = {e for e in emails if len(e) < 50
-                    and not any(ext in e.lower() for ext in ['.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp'])
-                    and not any(x in e.lower() for x in ['example.com', 'yourdomain', 'sentry.io', 'wixpress.com', 'google.com'])}
+    valid_emails = set()
+    for e in set(find_emails(EMAIL_RE, text)):
+        lower = e.lower()
+        if (len(e) < 50 and not lower.endswith(IMAGE_SUFFIXES)
+                and not is_blocked_email(lower, BLOCKED_DOMAINS)):
+            valid_emails.add(e)
     return valid_emails
 
 def scrape_email_from_website(url):
@@ -50,32 +62,37 @@ def scrape_email_from_website(url):
         if not url.startswith('http'):
             url = 'http://' + url
         logging.info(f"Scraping emails from {url}...")
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'}
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            text = soup.get_text(separator=' ')
-            emails = extract_emails_from_text(text)
-            # Also check mailto links
-            for a_tag in soup.find_all('a', href=True):
-                href = a_tag['href']
-                if href.startswith('mailto:'):
-                    email = href.replace('mailto:', '').split('?')[0].strip()
-                    if email and '@' in email:
-                        emails.add(email)
-            # Check contact page if no emails found
+        # Capped, streamed download parsed with lxml's C parser
+        html = fetch_html(SESSION, url, timeout=10)
+        if html is not None:
+            # Emails usually appear verbatim in the markup, so the regex runs on the raw HTML
+            # first; the page is only parsed (for mailto links and contact pages) when that finds nothing
+            emails = extract_emails_from_text(html)
             if not emails:
-                contact_links = soup.find_all('a', href=re.compile(r'contact', re.I))
-                for link in contact_links[:2]:
-                    contact_url = link.get('href')
-                    if contact_url:
+                soup = BeautifulSoup(html, 'lxml')
+                text = soup.get_text(separator=' ')
+                emails = extract_emails_from_text(text)
+                # One pass over the links: mailtos are harvested, contact pages kept as a fallback
+                contact_links = []
+                for a_tag in soup.find_all('a', href=True):
+                    href = a_tag['href']
+                    if href.startswith('mailto:'):
+                        email = href.replace('mailto:', '').split('?')[0].strip()
+                        if email and '@' in email:
+                            emails.add(email)
+                    elif CONTACT_RE.search(href):
+                        contact_links.append(href)
+                # Check contact page if no emails found
+                if not emails:
+                    parts = urlparse(url)
+                    base_url = f"{parts.scheme}://{parts.netloc}"
+                    for contact_url in contact_links[:2]:
                         if not contact_url.startswith('http'):
-                            base_url = f"{urlparse(url).scheme}://{urlparse(url).netloc}"
                             contact_url = base_url + (contact_url if contact_url.startswith('/') else '/' + contact_url)
                         try:
-                            cr = requests.get(contact_url, headers=headers, timeout=5)
-                            if cr.status_code == 200:
-                                cs = BeautifulSoup(cr.text, 'html.parser')
+                            contact_html = fetch_html(SESSION, contact_url, timeout=5)
+                            if contact_html is not None:
+                                cs = BeautifulSoup(contact_html, 'lxml')
                                 emails.update(extract_emails_from_text(cs.get_text(separator=' ')))
                                 for a_tag in cs.find_all('a', href=True):
                                     href = a_tag['href']
@@ -91,94 +108,29 @@ def scrape_email_from_website(url):
         logging.error(f"Scrape error: {str(e)[:60]}")
     return ""
 
-def save_lead_incrementally(lead, filename):
-    output_path = os.path.join(OUTPUT_DIR, filename)
-    file_exists = os.path.isfile(output_path)
-    with open(output_path, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=lead.keys())
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(lead)
-
 def fetch_leads(base_queries, locations, city, limit, category, filename):
-    leads = []
-    seen_identifiers = set()
     output_path = os.path.join(OUTPUT_DIR, filename)
-
-    # Resume from existing file
-    if os.path.exists(output_path):
-        try:
-            with open(output_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    phone = row.get("phone")
-                    title = row.get("title")
-                    address = row.get("address")
-                    dedup_key = phone if phone else (f"{title}|{address}" if address else title)
-                    if dedup_key:
-                        seen_identifiers.add(dedup_key)
-                        leads.append(row)
-            logging.info(f"Resuming {filename}: Found {len(leads)} existing leads.")
-        except Exception as e:
-            logging.error(f"Error reading existing file: {e}")
-
-    for location in locations:
-        if len(leads) >= limit:
-            break
-        for query_base in base_queries:
-            if len(leads) >= limit:
-                break
-            query = f"{query_base} {location}"
-            logging.info(f"Searching: {query}")
-            params = {
-                "engine": "google_maps",
-                "q": query,
-                "type": "search",
-                "api_key": api_key,
-                "start": 0
-            }
-            try:
-                search = GoogleSearch(params)
-                results = search.get_dict()
-                local_results = results.get("local_results", [])
-                if not local_results:
-                    logging.info("No results found")
-                    continue
-                new_count = 0
-                for result in local_results:
-                    if len(leads) >= limit:
-                        break
-                    title = result.get("title")
-                    phone = result.get("phone")
-                    address = result.get("address")
-                    website = result.get("website")
-                    dedup_key = phone if phone else (f"{title}|{address}" if address else title)
-                    if dedup_key and dedup_key not in seen_identifiers:
-                        seen_identifiers.add(dedup_key)
-                        email = scrape_email_from_website(website) if website else ""
-                        lead = {
-                            "title": title,
-                            "address": address,
-                            "phone": phone,
-                            "website": website,
-                            "email": email,
-                            "rating": result.get("rating"),
-                            "reviews": result.get("reviews"),
-                            "type": result.get("type"),
-                            "category": category,
-                            "source_query": query,
-                            "city": city
-                        }
-                        leads.append(lead)
-                        save_lead_incrementally(lead, filename)
-                        new_count += 1
-                if new_count > 0:
-                    logging.info(f"Added {new_count} | Total: {len(leads)}/{limit}")
-                time.sleep(0.5)
-            except Exception as e:
-                logging.error(f"Error: {e}")
-                time.sleep(1)
-    return leads
+    seen_identifiers, existing = scan_existing(output_path)
+
+    def scrape_and_save(lead):
+        lead["email"] = scrape_email_from_website(lead["website"])
+        append_lead(lead, output_path)
+
+    def on_page(new_leads):
+        # Leads without a website are final already, so a page's worth is written at once
+        no_website = []
+        for lead in new_leads:
+            if lead["website"]:
+                scrape_pool.submit(scrape_and_save, lead)
+            else:
+                no_website.append(lead)
+        append_leads(no_website, output_path)
+
+    # Leaving the pool waits for every pending scrape to finish and be saved
+    with ThreadPoolExecutor(max_workers=SCRAPE_WORKERS) as scrape_pool:
+        return search_leads(base_queries, locations, city, limit, api_key, category,
+                            with_email=True, seen_identifiers=seen_identifiers,
+                            existing=existing, on_page=on_page)
 
 def get_wellness_leads(city, limit=100):
     logging.info(f"===== WELLNESS CENTRES - {city.upper()} =====")
@@ -0,0 +1,436 @@
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import random
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, HTTPError as Urllib3Error, ReadTimeoutError
+from urllib3.util.retry import Retry
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:  # orjson is optional; fall back to the stdlib decoder
+    _json_loads = json.loads
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: allows rate_per_sec calls per second on average, and
+    up to `burst` calls back to back after an idle spell. With the default burst of 1
+    calls are simply spaced at least 1/rate_per_sec seconds apart.
+    """
+
+    def __init__(self, rate_per_sec, burst=1):
+        self.rate = rate_per_sec
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # Take a token under the lock (going negative reserves a future one),
+        # then sleep outside it so other threads can queue up meanwhile.
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+
+def make_session(pool_size=32, user_agent=None, retries=0, max_redirects=None):
+    """
+    Builds a requests.Session whose connection pool is sized for threaded use.
+    `retries` adds urllib3-level retries (with a short backoff) for failed connects/reads.
+    """
+    session = requests.Session()
+    max_retries = Retry(total=retries, backoff_factor=0.3) if retries else 0
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=max_retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if user_agent:
+        session.headers.update({'User-Agent': user_agent})
+    if max_redirects is not None:
+        session.max_redirects = max_redirects
+    return session
+
+
+_dns_cache = {}
+_dns_lock = threading.Lock()
+_real_getaddrinfo = socket.getaddrinfo
+
+
+def _cached_getaddrinfo(ttl, maxsize):
+    def getaddrinfo(*args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        now = time.monotonic()
+        with _dns_lock:
+            hit = _dns_cache.get(key)
+        if hit is not None and hit[0] > now:
+            return hit[1]
+        # Failures aren't cached, so a transient resolver error is retried next time
+        result = _real_getaddrinfo(*args, **kwargs)
+        with _dns_lock:
+            if len(_dns_cache) >= maxsize:
+                _dns_cache.clear()
+            _dns_cache[key] = (now + ttl, result)
+        return result
+    return getaddrinfo
+
+
+def enable_dns_cache(ttl=300, maxsize=4096):
+    """
+    Caches socket.getaddrinfo results process-wide for `ttl` seconds. Every new
+    connection does its own lookup, so parallel fetches of one site's pages,
+    retries and reconnects to a host skip DNS after the first. Safe to call more than once.
+    """
+    if socket.getaddrinfo is _real_getaddrinfo:
+        socket.getaddrinfo = _cached_getaddrinfo(ttl, maxsize)
+
+
+def imap_bounded(fn, items, max_workers):
+    """
+    Runs fn(item) for each item on a thread pool, keeping at most max_workers
+    calls in flight, and yields (item, future) pairs as calls finish.
+    Items are submitted lazily, so breaking out of the loop early stops new
+    calls from being made (only the ones already in flight still complete).
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = {executor.submit(fn, item): item for item in itertools.islice(items, max_workers)}
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield in_flight.pop(future), future
+                for item in itertools.islice(items, 1):
+                    in_flight[executor.submit(fn, item)] = item
+
+
+class UnrecoverableError(Exception):
+    """A failure that retrying will not fix, e.g. a 4xx other than 429."""
+
+
+def _retry_after(exc):
+    """Seconds from a Retry-After header on the exception's response, if any."""
+    response = getattr(exc, 'response', None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+def with_retry(fn, *args, max_retries=3, base=1.0, cap=30.0,
+               retry_on=(requests.RequestException, TimeoutError), **kwargs):
+    """
+    Calls fn(*args, **kwargs), retrying exceptions in `retry_on` with
+    exponential backoff plus jitter (or the response's Retry-After, when given).
+    UnrecoverableError is raised immediately.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except UnrecoverableError:
+            raise
+        except retry_on as e:
+            if attempt == max_retries:
+                raise
+            delay = _retry_after(e)
+            if delay is None:
+                delay = base * 2 ** attempt * (1 + random.random() * 0.5)
+            time.sleep(min(cap, delay))
+
+
+def get_with_retry(session, url, max_retries=3, **kwargs):
+    """GETs a URL, retrying timeouts, connection errors, 429s and 5xx responses."""
+    def attempt():
+        response = session.get(url, **kwargs)
+        if response.status_code == 429 or response.status_code >= 500:
+            raise requests.HTTPError(f"HTTP {response.status_code} for {url}", response=response)
+        if response.status_code >= 400:
+            raise UnrecoverableError(f"HTTP {response.status_code} for {url}")
+        return response
+    return with_retry(attempt, max_retries=max_retries)
+
+
+class DiskCache:
+    """
+    Small thread-safe key/value cache persisted in SQLite, with a per-cache TTL.
+    Values are pickled, so anything picklable (including "" for cached misses) can be stored.
+    The database file is only created on first use.
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = None
+
+    def _connect(self):
+        if self.conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL)'
+            )
+        return self.conn
+
+    def get(self, key, default=None):
+        with self.lock:
+            row = self._connect().execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return default
+        return pickle.loads(row[0])
+
+    def set(self, key, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            conn = self._connect()
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                (key, blob, time.time() + self.ttl),
+            )
+            conn.commit()
+
+
+# Emails and contact links sit near the top of a page (header/footer markup), so larger pages are truncated
+MAX_PAGE_BYTES = 512 * 1024
+# A page declaring a body larger than this is a download or a tarpit, not a site's homepage,
+# so it's skipped on its headers rather than read up to MAX_PAGE_BYTES
+MAX_DECLARED_BYTES = 4 * 1024 * 1024
+# Unreachable hosts fail fast; the per-call timeout only bounds the read
+CONNECT_TIMEOUT = 3
+# Page fetches allowed in flight to any one host; a site hit with more than a couple
+# of parallel requests tends to answer with 403s/429s
+MAX_PER_HOST = 2
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+# Sites that can't be fetched, kept for a day so later runs skip them instead of waiting
+# out the timeout again. A whole host is recorded only when connecting to it fails (DNS,
+# refused, connect timeout); a page answering DEAD_PAGE_STATUSES is recorded on its own,
+# since one closed page on facebook.com or sites.google.com says nothing about the rest
+DEAD_SITE_TTL = 24 * 60 * 60
+DEAD_PAGE_STATUSES = (404, 410, 451)
+DEAD_SITES = DiskCache(os.path.join('.cache', 'dead_sites.sqlite'), ttl=DEAD_SITE_TTL)
+
+
+def site_key(url):
+    """A site's host, lowercased and without a leading 'www.', for keying per-site caches."""
+    host = urlsplit(url).netloc.lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def page_key(url):
+    """
+    A page's site_key plus its path and query (no scheme, fragment or trailing slash), for
+    keying per-page caches. Pages on shared hosts (facebook.com/x, sites.google.com/view/y)
+    belong to different businesses, so they mustn't share an entry the way site_key would.
+    """
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+    key = (host[4:] if host.startswith('www.') else host) + parts.path.rstrip('/')
+    return key + '?' + parts.query if parts.query else key
+
+
+def failed_to_connect(exc):
+    """True if a requests exception is a DNS failure, refused connection or connect timeout."""
+    reason = getattr(exc.args[0], 'reason', None) if exc.args else None
+    return isinstance(exc, requests.ConnectTimeout) or isinstance(reason, ConnectTimeoutError)
+
+
+def mark_host_dead(url):
+    """Records that `url`'s host couldn't be connected to, so is_dead skips it for DEAD_SITE_TTL."""
+    DEAD_SITES.set('host ' + site_key(url), time.time())
+
+
+def mark_page_dead(url):
+    """Records that the page at `url` is gone, so is_dead skips it (only it) for DEAD_SITE_TTL."""
+    DEAD_SITES.set('page ' + page_key(url), time.time())
+
+
+def is_dead(url):
+    """True if `url`'s host or the page itself was recorded dead within DEAD_SITE_TTL."""
+    return (DEAD_SITES.get('host ' + site_key(url)) is not None
+            or DEAD_SITES.get('page ' + page_key(url)) is not None)
+
+
+class KeepCharsTable(dict):
+    """
+    str.translate table that keeps the characters in `keep` and maps every other
+    character to `other` (deleted when None). Entries for the rest of Unicode are
+    filled in as characters are first seen, so the table stays small.
+    """
+
+    def __init__(self, keep, other=None):
+        super().__init__((ord(ch), ch) for ch in keep)
+        self.other = other
+
+    def __missing__(self, codepoint):
+        self[codepoint] = self.other
+        return self.other
+
+
+def _host_slot(url):
+    host = urlsplit(url).netloc.lower()
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(MAX_PER_HOST)
+    return slot
+
+
+def fetch_html(session, url, timeout, max_bytes=MAX_PAGE_BYTES, remember_dead=False, host_limited=True):
+    """
+    GETs a page and returns at most `max_bytes` of its HTML, or None if it isn't a 200,
+    isn't HTML or declares a Content-Length over MAX_DECLARED_BYTES. Those checks only need
+    the response headers, so PDFs, images and other downloads are dropped before their
+    body is read, without a separate HEAD round trip.
+    The body is streamed, so oversized pages are never downloaded in full.
+    At most MAX_PER_HOST fetches run against one host at a time; others wait their turn.
+    host_limited=False lets a fetch that others are waiting on (a site's homepage, while
+    its guessed subpages load alongside) skip that queue.
+    With remember_dead=True (meant for a site's homepage, not its subpages), a host that
+    can't be connected to, or a page answering DEAD_PAGE_STATUSES, is recorded in DEAD_SITES,
+    and fetches of a recorded host or page return None straight away.
+    """
+    if remember_dead and is_dead(url):
+        return None
+    with _host_slot(url) if host_limited else nullcontext():
+        try:
+            response = session.get(url, timeout=(CONNECT_TIMEOUT, timeout), stream=True, allow_redirects=True)
+        except requests.RequestException as e:
+            if remember_dead and failed_to_connect(e):
+                mark_host_dead(url)
+            raise
+        with response:
+            if response.status_code != 200:
+                if remember_dead and response.status_code in DEAD_PAGE_STATUSES:
+                    mark_page_dead(url)
+                return None
+            content_type = response.headers.get('Content-Type', '').lower()
+            if content_type and 'html' not in content_type:
+                return None
+            try:
+                if int(response.headers.get('Content-Length') or 0) > MAX_DECLARED_BYTES:
+                    return None
+            except ValueError:
+                pass
+            # Reading the raw stream bypasses requests' own error wrapping, so a body that
+            # stalls or is cut off is re-raised as the requests error callers already catch
+            try:
+                body = response.raw.read(max_bytes, decode_content=True)
+            except ReadTimeoutError as e:
+                raise requests.Timeout(e, request=response.request) from e
+            except Urllib3Error as e:
+                raise requests.ConnectionError(e, request=response.request) from e
+            return body.decode(response.encoding or 'utf-8', errors='replace')
+
+
+# Characters searched either side of each '@'. Callers drop addresses of 50+ characters,
+# so a match clipped by the window is one that would have been dropped anyway.
+EMAIL_WINDOW = 64
+
+
+def iter_emails(pattern, text, window=EMAIL_WINDOW):
+    """
+    Yields the matches of an email `pattern` in `text`, running the regex only on the
+    short stretches around each '@' instead of over the whole page. A match is kept
+    only if it contains the '@' whose window found it, so neighbouring windows can't
+    yield a clipped copy of another address. Matches come in page order, so the
+    first one is what pattern.search would find (for matches that fit the window).
+    """
+    find = text.find
+    last_end = 0
+    at = find('@')
+    while at != -1:
+        for match in pattern.finditer(text, max(last_end, at - window), at + window + 1):
+            if match.start() < at < match.end():
+                yield match.group()
+                last_end = match.end()
+                break
+        at = find('@', at + 1)
+
+
+def find_emails(pattern, text, window=EMAIL_WINDOW):
+    """Returns every match of iter_emails as a list."""
+    return list(iter_emails(pattern, text, window))
+
+
+# Addresses at these domains belong to placeholders, error trackers and site builders
+# rather than the business. They're matched against '.' + the address's domain, so
+# subdomains (e.g. Sentry's o123.ingest.sentry.io) are caught with one C-level endswith.
+BLOCKED_EMAIL_DOMAINS = ('.example.com', '.sentry.io', '.wixpress.com')
+
+
+def is_blocked_email(lower, blocked_domains=BLOCKED_EMAIL_DOMAINS):
+    """
+    True if a lowercased address is at one of `blocked_domains` (or a subdomain of one),
+    or is a template placeholder at any 'yourdomain.' domain (yourdomain.com, .in, .co.uk...).
+    """
+    domain = '.' + lower.rpartition('@')[2]
+    return 'yourdomain.' in domain or domain.endswith(blocked_domains)
+
+
+SERPAPI_URL = "https://serpapi.com/search.json"
+
+# Raw SerpAPI responses, kept for a week when SERPAPI_CACHE=1 so reruns don't re-spend credits
+SERPAPI_CACHE = DiskCache(os.path.join('.cache', 'serpapi.sqlite'), ttl=7 * 24 * 60 * 60)
+
+
+def _serpapi_cache_key(params):
+    # The API key doesn't change the answer, so it's left out of the key
+    query = {k: v for k, v in params.items() if k != 'api_key'}
+    return hashlib.sha256(json.dumps(query, sort_keys=True).encode()).hexdigest()
+
+
+def serpapi_search(session, params, limiter=None, max_retries=3, timeout=15):
+    """
+    Queries SerpAPI's JSON endpoint over `session`. Each attempt waits on `limiter`
+    (if given); 429s, 5xx responses and network errors are retried with backoff,
+    other 4xx responses (e.g. a bad API key) raise UnrecoverableError.
+    With SERPAPI_CACHE=1 in the environment, responses are served from and saved to disk.
+    """
+    use_cache = os.getenv('SERPAPI_CACHE') == '1'
+    if use_cache:
+        key = _serpapi_cache_key(params)
+        cached = SERPAPI_CACHE.get(key)
+        if cached is not None:
+            return cached
+
+    def attempt():
+        if limiter is not None:
+            limiter.acquire()
+        response = get_with_retry(session, SERPAPI_URL, max_retries=0, params=params, timeout=timeout)
+        # SerpAPI payloads run to a few hundred KB, so decoding the raw bytes with orjson is noticeably cheaper
+        return _json_loads(response.content)
+    results = with_retry(attempt, max_retries=max_retries)
+
+    if use_cache and 'error' not in results:
+        SERPAPI_CACHE.set(key, results)
+    return results
+
+
+def warm_serpapi_connection(session, timeout=CONNECT_TIMEOUT):
+    """
+    Opens a keep-alive connection to SerpAPI on `session` with a HEAD request (no API key,
+    so no search credit is spent), so a search made shortly after skips DNS, TCP and TLS
+    setup. Failures are ignored; the search then just connects as usual.
+    """
+    try:
+        session.head(SERPAPI_URL, timeout=timeout).close()
+    except requests.RequestException:
+        pass
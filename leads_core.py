@@ -0,0 +1,302 @@
+import os
+import csv
+import atexit
+import hashlib
+import re
+import itertools
+import random
+import logging
+import threading
+import time
+from operator import itemgetter
+from dotenv import load_dotenv
+from http_utils import RateLimiter, imap_bounded, make_session, serpapi_search
+
+logger = logging.getLogger(__name__)
+
+# Search tables shared by the hydrogen water lead scripts
+MANUFACTURER_QUERIES = (
+    "Hydrogen water machine manufacturer",
+    "Alkaline water ionizer manufacturer",
+    "Water ionizer manufacturer",
+    "Hydrogen water bottle manufacturer",
+    "Water purification equipment manufacturer",
+    "Electrolysis water machine manufacturer",
+    "Hydrogen generator manufacturer",
+    "Industrial water equipment manufacturer",
+    "Water treatment equipment manufacturer",
+    "Alkaline water machine factory",
+)
+
+VENDOR_QUERIES = (
+    "Hydrogen water machine dealer",
+    "Hydrogen water machine vendor",
+    "Hydrogen water machine supplier",
+    "Kangen water distributor",
+    "Enagic distributor",
+    "Alkaline water ionizer dealer",
+    "Hydrogen water ionizer dealer",
+    "Water ionizer supplier",
+    "Alkaline water machine dealer",
+    "Hydrogen water equipment supplier",
+    "Kangen water seller",
+    "Water purifier dealer",
+)
+
+# Location variations per city
+MANUFACTURER_LOCATIONS = {
+    "Mumbai": ("Mumbai", "Mumbai Andheri", "Mumbai Borivali", "Thane", "Navi Mumbai", "Mumbai Goregaon"),
+    "Pune": ("Pune", "Pune Kothrud", "Pune Wakad", "Pune Hadapsar", "Pimpri Chinchwad", "Pune Hinjewadi"),
+}
+
+VENDOR_LOCATIONS = {
+    "Mumbai": ("Mumbai", "Mumbai Bandra", "Mumbai Malad", "Mumbai Powai", "Mumbai Kurla", "Navi Mumbai", "Mumbai Kandivali"),
+    "Pune": ("Pune", "Pune Baner", "Pune Viman Nagar", "Pune Aundh", "Pune Koregaon Park", "Pimpri Chinchwad", "Pune Magarpatta"),
+}
+
+# Maps results that are clearly not hydrogen water businesses, dropped before any
+# per-lead work (dedup, saving, website scraping). Types are matched word by word,
+# so "atm" rejects an ATM but not a "Water treatment" supplier.
+HYDROGEN_REJECT_TYPES = frozenset({"restaurant", "atm", "hotel", "hospital", "clinic", "school", "bank", "temple"})
+
+def load_api_key():
+    """Read SERPAPI_KEY from .env.local, falling back to .env; None if neither has it"""
+    load_dotenv('.env.local')
+    api_key = os.getenv("SERPAPI_KEY")
+    if not api_key:
+        load_dotenv('.env')
+        api_key = os.getenv("SERPAPI_KEY")
+    return api_key
+
+_NON_DIGITS = re.compile(r'\D')
+_WORDS = re.compile(r'[a-z]+')
+
+def canon_key(phone, title, address):
+    """
+    Dedup key for a lead: its phone digits, else its case- and space-folded title+address.
+    A resumed run holds one key per existing row, so keys are stored as 8-byte blake2b
+    digests rather than the full strings (a collision is a 1 in 2**64 chance per pair).
+    """
+    digits = _NON_DIGITS.sub('', phone or '')
+    if digits:
+        key = 'p:' + digits
+    else:
+        title = ' '.join((title or '').lower().split())
+        if not title:
+            return None
+        # \x1f (unit separator) can't appear in folded text, so title/address stay unambiguous
+        key = 't:' + title + '\x1f' + ' '.join((address or '').lower().split())
+    return hashlib.blake2b(key.encode(), digest_size=8).digest()
+
+# SerpAPI searches kept in flight at once
+SERP_WORKERS = 4
+# Paces SerpAPI calls across all workers (at most 5 per second)
+SERP_LIMITER = RateLimiter(5.0)
+SERP_SESSION = make_session(pool_size=SERP_WORKERS)
+
+def search_maps(query, api_key):
+    """Runs one SerpAPI Google Maps search for the query."""
+    params = {
+        "engine": "google_maps",
+        "q": query,
+        "type": "search",
+        "api_key": api_key,
+        "start": 0
+    }
+    # 429s, 5xx responses and dropped connections are retried with backoff
+    return serpapi_search(SERP_SESSION, params, SERP_LIMITER)
+
+def scan_existing(output_path):
+    """
+    Read the dedup keys of leads already saved in a CSV, for resuming a run.
+    Returns (seen_identifiers, count); both are empty if the file doesn't exist.
+    """
+    seen_identifiers = set()
+    count = 0
+    if not os.path.exists(output_path):
+        return seen_identifiers, count
+    try:
+        with open(output_path, 'r', encoding='utf-8', newline='') as f:
+            # Only the dedup columns are needed, so rows stay plain lists
+            reader = csv.reader(f)
+            header = next(reader, [])
+            cols = [header.index(name) if name in header else None for name in ("phone", "title", "address")]
+            for row in reader:
+                dedup_key = canon_key(*(row[i] if i is not None and i < len(row) else None for i in cols))
+                if dedup_key:
+                    seen_identifiers.add(dedup_key)
+                    count += 1
+        logger.info(f"Resuming {os.path.basename(output_path)}: Found {count} existing leads.")
+    except Exception as e:
+        logger.error(f"Error reading existing file: {e}")
+    return seen_identifiers, count
+
+def fetch_leads(base_queries, locations, city, limit, api_key, category=None,
+                with_email=False, seen_identifiers=None, existing=0, on_lead=None,
+                on_page=None, reject_types=frozenset()):
+    """
+    Fetch leads using SerpAPI Google Maps search.
+    Leads are deduplicated against `seen_identifiers` (e.g. from scan_existing), and
+    `existing` leads already saved count toward `limit`. `on_lead(lead)` is called for
+    each new lead as it's found, and `on_page(new_leads)` once per search with the new
+    leads it produced, for callers that handle a page's leads in one batch.
+    Returns only the leads found in this run.
+    Results whose type has a word in `reject_types` (matched lowercase) are skipped.
+    """
+    leads = []
+    if seen_identifiers is None:
+        seen_identifiers = set()
+    # Leads already saved count toward the limit
+    target = limit - existing
+    if target <= 0:
+        return leads
+
+    # Searches run a few at a time; results are merged here on one thread,
+    # so the dedup set and lead list need no locking
+    # Shuffled with a fixed seed so stopping at the limit doesn't always cover the
+    # same leading locations, while reruns (and resumes) keep the same order
+    pairs = list(itertools.product(locations, base_queries))
+    random.Random(42).shuffle(pairs)
+    queries = (f"{query_base} {location}" for location, query_base in pairs)
+    for query, future in imap_bounded(lambda q: search_maps(q, api_key), queries, SERP_WORKERS):
+        logger.info(f"Searching: {query}")
+        try:
+            results = future.result()
+            local_results = results.get("local_results", [])
+
+            if not local_results:
+                logger.info("No results found")
+                continue
+
+            page_start = len(leads)
+            for result in local_results:
+                if len(leads) >= target:
+                    break
+
+                title = result.get("title")
+                if reject_types:
+                    if not reject_types.isdisjoint(_WORDS.findall((result.get("type") or "").lower())):
+                        continue
+
+                phone = result.get("phone")
+                address = result.get("address")
+
+                # Deduplicate by phone digits, else case-folded title+address
+                dedup_key = canon_key(phone, title, address)
+
+                if dedup_key and dedup_key not in seen_identifiers:
+                    seen_identifiers.add(dedup_key)
+
+                    lead = {
+                        "title": title,
+                        "address": address,
+                        "phone": phone,
+                        "website": result.get("website"),
+                    }
+                    if with_email:
+                        lead["email"] = ""
+                    lead["rating"] = result.get("rating")
+                    lead["reviews"] = result.get("reviews")
+                    lead["type"] = result.get("type")
+                    if category is not None:
+                        lead["category"] = category
+                    lead["source_query"] = query
+                    lead["city"] = city
+
+                    leads.append(lead)
+                    if on_lead is not None:
+                        on_lead(lead)
+
+            new_count = len(leads) - page_start
+            if new_count > 0:
+                if on_page is not None:
+                    on_page(leads[page_start:])
+                logger.info(f"Added {new_count} | Total: {existing + len(leads)}/{limit}")
+        except Exception as e:
+            logger.error(f"Error: {e}")
+
+        if len(leads) >= target:
+            break
+
+    return leads
+
+def save_to_csv(leads, filename):
+    """Save leads to CSV"""
+    if not leads:
+        logger.warning(f"No leads to save for {filename}")
+        return
+
+    # Every lead from one fetch has the same keys, so rows are pulled out as
+    # tuples with one itemgetter instead of DictWriter's per-field lookups
+    keys = tuple(leads[0])
+    row_values = itemgetter(*keys)
+
+    logger.info(f"Saving {len(leads)} leads to {filename}...")
+    with open(filename, 'w', newline='', encoding='utf-8', buffering=1 << 20) as output_file:
+        writer = csv.writer(output_file)
+        writer.writerow(keys)
+        writer.writerows(map(row_values, leads))
+
+    logger.info(f"Created {filename}")
+
+# Open CSV writers per output file, kept for the whole run instead of reopening
+# the file for every lead; rows are flushed to disk every LEAD_FLUSH_EVERY leads, and a
+# background thread flushes any rows still buffered every LEAD_FLUSH_SECS, so a slow
+# run that crashes loses little even during a long gap between leads.
+LEAD_FLUSH_EVERY = 16
+LEAD_FLUSH_SECS = 5.0
+_lead_writers = {}
+_save_lock = threading.Lock()
+_flusher = None
+
+def _flush_buffered_leads():
+    """Flushes every lead CSV with buffered rows, once per LEAD_FLUSH_SECS, for the life of the process"""
+    while True:
+        time.sleep(LEAD_FLUSH_SECS)
+        with _save_lock:
+            for entry in _lead_writers.values():
+                if entry[2]:
+                    entry[0].flush()
+                    entry[2] = 0
+
+def append_lead(lead, output_path):
+    """Append a single lead to a CSV, writing the header first if the file is new (thread-safe)"""
+    append_leads((lead,), output_path)
+
+def append_leads(leads, output_path):
+    """Append a batch of leads to a CSV with one writerows call (thread-safe, see append_lead)"""
+    if not leads:
+        return
+    global _flusher
+    with _save_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_buffered_leads, daemon=True)
+            _flusher.start()
+        entry = _lead_writers.get(output_path)
+        if entry is None:
+            # Open (or create) in append mode and check the size on the same descriptor,
+            # so an existing-but-empty file still gets a header
+            fd = os.open(output_path, os.O_CREAT | os.O_WRONLY | os.O_APPEND, 0o644)
+            needs_header = os.fstat(fd).st_size == 0
+            output_file = os.fdopen(fd, 'a', newline='', encoding='utf-8', buffering=1 << 16)
+            dict_writer = csv.DictWriter(output_file, fieldnames=leads[0].keys())
+            if needs_header:
+                dict_writer.writeheader()
+                output_file.flush()
+            # [file, writer, rows written since the last flush]
+            entry = _lead_writers[output_path] = [output_file, dict_writer, 0]
+
+        entry[1].writerows(leads)
+        entry[2] += len(leads)
+        if entry[2] >= LEAD_FLUSH_EVERY:
+            entry[0].flush()
+            entry[2] = 0
+
+def close_lead_writers():
+    """Flush and close every open lead CSV (registered to run at exit)"""
+    with _save_lock:
+        for output_file, *_ in _lead_writers.values():
+            output_file.close()
+        _lead_writers.clear()
+
+atexit.register(close_lead_writers)
@@ -1,12 +1,12 @@
 import os
 import csv
 import re
-import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse
 import sys
 import logging
-import time
+from concurrent.futures import ThreadPoolExecutor
+from http_utils import BLOCKED_EMAIL_DOMAINS, enable_dns_cache, fetch_html, find_emails, is_blocked_email, make_session
 
 sys.stdout.reconfigure(encoding='utf-8')
 
@@ -20,13 +20,34 @@ logging.basicConfig(
 )
 
 FOLDER = "wellness_gym_leads"
+# Websites scraped at once; each row is a different site, so no per-request delay is needed
+SCRAPE_WORKERS = 20
+# CSVs processed at once; files are independent, so one slow file doesn't hold up the rest
+CSV_WORKERS = 4
+# One keep-alive pool for every scrape, so contact/about pages reuse the homepage's connection
+SESSION = make_session(
+    pool_size=64,
+    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    retries=2,
+)
+# New connections to a host already looked up (parallel page fetches, retries) skip DNS
+enable_dns_cache()
+
+# Patterns are compiled once instead of on every page
+EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+CONTACT_RE = re.compile(r'contact', re.I)
+ABOUT_RE = re.compile(r'about', re.I)
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp')
+# This pass also drops Google embeds and the email.com/website.com placeholders
+BLOCKED_DOMAINS = BLOCKED_EMAIL_DOMAINS + ('.google.com', '.email.com', '.website.com')
 
 def extract_emails_from_text(text):
-    email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-    emails = set(re.findall(email_pattern, text))
-    valid = {e for e in emails if len(e) < 50
-             and not any(ext in e.lower() for ext in ['.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp'])
-             and not any(x in e.lower() for x in ['example.com', 'yourdomain', 'sentry.io', 'wixpress.com', 'google.com', 'email.com', 'website.com'])}
+    valid = set()
+    for e in set(find_emails(EMAIL_RE, text)):
+        lower = e.lower()
+        if (len(e) < 50 and not lower.endswith(IMAGE_SUFFIXES)
+                and not is_blocked_email(lower, BLOCKED_DOMAINS)):
+            valid.add(e)
     return valid
 
 def scrape_email(url):
@@ -35,40 +56,48 @@ def scrape_email(url):
     try:
         if not url.startswith('http'):
             url = 'http://' + url
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'}
-        resp = requests.get(url, headers=headers, timeout=12)
-        if resp.status_code == 200:
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            text = soup.get_text(separator=' ')
-            emails = extract_emails_from_text(text)
-            # mailto links
-            for a in soup.find_all('a', href=True):
-                if a['href'].startswith('mailto:'):
-                    em = a['href'].replace('mailto:', '').split('?')[0].strip()
-                    if em and '@' in em:
-                        emails.add(em)
-            # Check contact/about pages
+        # Capped, streamed download parsed with lxml's C parser
+        html = fetch_html(SESSION, url, timeout=12)
+        if html is not None:
+            # Emails usually appear verbatim in the markup, so the regex runs on the raw HTML
+            # first; the page is only parsed (for mailto links and contact pages) when that finds nothing
+            emails = extract_emails_from_text(html)
             if not emails:
-                for pattern in [r'contact', r'about']:
-                    links = soup.find_all('a', href=re.compile(pattern, re.I))
-                    for link in links[:2]:
-                        href = link.get('href')
-                        if href:
+                soup = BeautifulSoup(html, 'lxml')
+                text = soup.get_text(separator=' ')
+                emails = extract_emails_from_text(text)
+                # One pass over the links: mailtos are harvested, contact/about pages kept as fallbacks
+                contact_links, about_links = [], []
+                for a in soup.find_all('a', href=True):
+                    href = a['href']
+                    if href.startswith('mailto:'):
+                        em = href.replace('mailto:', '').split('?')[0].strip()
+                        if em and '@' in em:
+                            emails.add(em)
+                    elif CONTACT_RE.search(href):
+                        contact_links.append(href)
+                    elif ABOUT_RE.search(href):
+                        about_links.append(href)
+                # Check contact/about pages
+                if not emails:
+                    parts = urlparse(url)
+                    base = f"{parts.scheme}://{parts.netloc}"
+                    for links in (contact_links, about_links):
+                        for href in links[:2]:
                             if not href.startswith('http'):
-                                base = f"{urlparse(url).scheme}://{urlparse(url).netloc}"
                                 href = base + (href if href.startswith('/') else '/' + href)
                             try:
-                                cr = requests.get(href, headers=headers, timeout=8)
-                                if cr.status_code == 200:
-                                    cs = BeautifulSoup(cr.text, 'html.parser')
+                                contact_html = fetch_html(SESSION, href, timeout=8)
+                                if contact_html is not None:
+                                    cs = BeautifulSoup(contact_html, 'lxml')
                                     emails.update(extract_emails_from_text(cs.get_text(separator=' ')))
                                     for a in cs.find_all('a', href=True):
                                         if a['href'].startswith('mailto:'):
                                             emails.add(a['href'].replace('mailto:', '').split('?')[0].strip())
                             except:
                                 pass
-                    if emails:
-                        break
+                        if emails:
+                            break
             filtered = {e for e in emails if '@' in e and '.' in e.split('@')[1]}
             if filtered:
                 return ", ".join(filtered)
@@ -82,13 +111,25 @@ def process_csv(filename):
         logging.info(f"File not found: {filepath}")
         return
 
-    rows = []
-    with open(filepath, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        fieldnames = reader.fieldnames
+    # Rows stay plain lists and columns are read by index, instead of building a dict per row
+    with open(filepath, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
         rows = list(reader)
+    if 'email' not in header:
+        header.append('email')
+    width = len(header)
+    for row in rows:
+        if len(row) < width:
+            row.extend([''] * (width - len(row)))
+    email_col = header.index('email')
+    columns = {name: i for i, name in enumerate(header)}
 
-    missing = [i for i, r in enumerate(rows) if not r.get('email', '').strip()]
+    def cell(row, name):
+        i = columns.get(name)
+        return row[i] if i is not None else ''
+
+    missing = [i for i, row in enumerate(rows) if not row[email_col].strip()]
     logging.info(f"\n{'='*50}")
     logging.info(f"{filename}: {len(rows)} leads, {len(missing)} missing emails")
     logging.info(f"{'='*50}")
@@ -97,35 +138,35 @@ def process_csv(filename):
         return
 
     found_count = 0
-    for idx in missing:
-        row = rows[idx]
-        website = row.get('website', '').strip()
-        title = row.get('title', '')
-        if not website:
-            logging.info(f"  [{idx+1}] {title} - No website, skipping")
-            continue
-
-        logging.info(f"  [{idx+1}] {title} -> {website}")
-        email = scrape_email(website)
-        if email:
-            rows[idx]['email'] = email
-            found_count += 1
-            logging.info(f"    FOUND: {email}")
-        else:
-            logging.info(f"    No email found")
-        time.sleep(0.3)
+    websites = [cell(rows[idx], 'website').strip() for idx in missing]
+    with ThreadPoolExecutor(max_workers=SCRAPE_WORKERS) as pool:
+        # map() yields in row order, so the log reads the same as a sequential run
+        for idx, website, email in zip(missing, websites, pool.map(scrape_email, websites)):
+            title = cell(rows[idx], 'title')
+            if not website:
+                logging.info(f"  [{filename} {idx+1}] {title} - No website, skipping")
+                continue
+
+            logging.info(f"  [{filename} {idx+1}] {title} -> {website}")
+            if email:
+                rows[idx][email_col] = email
+                found_count += 1
+                logging.info(f"    FOUND: {email}")
+            else:
+                logging.info(f"    No email found")
 
     # Rewrite CSV
     with open(filepath, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
+        writer = csv.writer(f)
+        writer.writerow(header)
         writer.writerows(rows)
 
     logging.info(f"Updated {filename}: Found {found_count} new emails out of {len(missing)} missing")
 
 if __name__ == "__main__":
     logging.info("RE-SCRAPING MISSING EMAILS FROM WELLNESS/GYM LEADS")
-    for fn in sorted(os.listdir(FOLDER)):
-        if fn.endswith('.csv'):
-            process_csv(fn)
+    csv_files = [fn for fn in sorted(os.listdir(FOLDER)) if fn.endswith('.csv')]
+    with ThreadPoolExecutor(max_workers=CSV_WORKERS) as file_pool:
+        # list() surfaces any exception raised while processing a file
+        list(file_pool.map(process_csv, csv_files))
     logging.info("DONE - All CSVs updated")
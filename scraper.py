@@ -1,24 +1,84 @@
 import os
 import csv
-import time
 import re
-import requests
 import json
-from bs4 import BeautifulSoup
-from serpapi import GoogleSearch
+import string
+import lxml.etree
+import lxml.html
 from urllib.parse import urlparse
 import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from http_utils import (
+    DiskCache, KeepCharsTable, RateLimiter, enable_dns_cache, fetch_html, find_emails, is_blocked_email,
+    make_session, page_key, serpapi_search,
+)
+
+# One keep-alive pool for every scrape, so a contact page reuses the homepage's connection
+SESSION = make_session(
+    pool_size=64,
+    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    retries=2,
+)
+# Websites from one results page are scraped in parallel, and progress is reported as each finishes
+SCRAPE_WORKERS = 10
+_SCRAPE_POOL = ThreadPoolExecutor(max_workers=SCRAPE_WORKERS)
+# New connections to a host already looked up (parallel page fetches, retries) skip DNS
+enable_dns_cache()
+# SerpAPI's JSON endpoint is called directly over its own pooled session (with
+# retries on 429/5xx); results pages that are certainly needed are fetched on
+# workers, up to SERP_PAGES_AHEAD at once, so they load in parallel
+SERP_PAGES_AHEAD = 4
+SERP_SESSION = make_session(pool_size=SERP_PAGES_AHEAD)
+_SERP_POOL = ThreadPoolExecutor(max_workers=SERP_PAGES_AHEAD)
+# Be nice to SerpAPI: 2 searches a second across all runs, with short bursts allowed
+SERP_LIMITER = RateLimiter(2.0, burst=10)
+
+# Emails found per website URL (see page_key), kept for a week so a vendor that turns up
+# again in a later search isn't scraped again (sites where nothing was found are retried)
+EMAIL_CACHE = DiskCache(os.path.join('.cache', 'page_emails.sqlite'), ttl=7 * 24 * 60 * 60)
+
+# Patterns are compiled once instead of on every page
+EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+CONTACT_RE = re.compile(r'contact', re.I)
+# Filenames keep ASCII letters and digits; anything else becomes '_'
+SAFE_FILENAME_TABLE = KeepCharsTable(string.ascii_letters + string.digits, '_')
+# Phone numbers are reduced to their digits with one C-level translate (no regex per
+# lead), so "+1 (415) 555-1212" and "1-415-555-1212" dedup to the same key
+_KEEP_DIGITS = KeepCharsTable(string.digits)
+
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp')
 
 def extract_emails_from_text(text):
     """Extract emails from text using regex"""
-    email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-    emails = set(re.findall(email_pattern, text))
+    emails = set(find_emails(EMAIL_RE, text))
     # Filter out invalid emails that might be image filenames or too long
-    valid_emails = {e for e in emails if len(e) < 50 and not any(ext in e.lower() for ext in ['.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp'])}
+    valid_emails = {e for e in emails if len(e) < 50 and not e.lower().endswith(IMAGE_SUFFIXES)}
     return valid_emails
 
+# Pages are parsed with lxml directly rather than into a BeautifulSoup tree. Bytes are fed
+# in with the encoding fixed, since fetch_html has already decoded them (and lxml refuses
+# str input that starts with an XML encoding declaration)
+_HTML_PARSER = lxml.html.HTMLParser(encoding='utf-8')
+_HIDDEN_TAGS = ('script', 'style', 'template', lxml.etree.Comment)
+
+def parse_page(html):
+    """
+    Parses a page and returns (text, hrefs): its visible text, as BeautifulSoup's
+    get_text(separator=' ') would give it, and the href of every link.
+    """
+    tree = lxml.etree.fromstring(html.encode('utf-8'), _HTML_PARSER)
+    if tree is None:
+        return '', []
+    # Scripts, styles, templates and comments are dropped (keeping the text after them),
+    # so every text node left is visible text
+    lxml.etree.strip_elements(tree, *_HIDDEN_TAGS, with_tail=False)
+    return ' '.join(tree.itertext()), tree.xpath('//a/@href', smart_strings=False)
+
 def scrape_email_from_website(url, emit_log=None):
     """Scrape emails from a website"""
     if not url:
@@ -28,49 +88,61 @@ def scrape_email_from_website(url, emit_log=None):
         # Add http if missing
         if not url.startswith('http'):
             url = 'http://' + url
+        
+        cached = EMAIL_CACHE.get(page_key(url))
+        if cached:
+            if emit_log:
+                emit_log(f"Found emails (cached): {cached}")
+            return cached
             
         if emit_log:
             emit_log(f"Scraping emails from {url}...")
             
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        response = requests.get(url, headers=headers, timeout=10)
+        # Capped, streamed download parsed with lxml's C parser; a dead site is
+        # remembered for a day, so later runs skip it without waiting on it again
+        html = fetch_html(SESSION, url, timeout=10, remember_dead=True)
         
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            # Use separator to avoid concatenated text like "info@kykindia.comHomeAbout"
-            text = soup.get_text(separator=' ')
-            emails = extract_emails_from_text(text)
-            
-            # Also check contact page if found
+        if html is not None:
+            # Emails usually appear verbatim in the markup, so the regex runs on the raw HTML
+            # first; the page is only parsed (for mailto links and contact pages) when that finds nothing
+            emails = {e for e in extract_emails_from_text(html) if not is_blocked_email(e.lower())}
             if not emails:
-                contact_links = soup.find_all('a', href=re.compile(r'contact', re.I))
-                for link in contact_links:
-                    contact_url = link.get('href')
-                    if contact_url:
+                # Text nodes are joined with spaces to avoid concatenated text like "info@kykindia.comHomeAbout"
+                text, links = parse_page(html)
+                emails = extract_emails_from_text(text)
+            
+                # Mailtos are harvested, contact pages kept as a fallback
+                contact_links = []
+                for href in links:
+                    if href.startswith('mailto'):
+                        email = href.replace('mailto:', '').split('?')[0].strip()
+                        if email:
+                            emails.add(email)
+                    elif CONTACT_RE.search(href) and not href.startswith(('javascript:', '#')) and href not in contact_links:
+                        contact_links.append(href)
+
+                # Only a page with no emails at all costs extra round trips, for at most two contact pages
+                if not emails:
+                    parts = urlparse(url)
+                    base_url = f"{parts.scheme}://{parts.netloc}"
+                    for contact_url in contact_links[:2]:
                         if not contact_url.startswith('http'):
-                            base_url = f"{urlparse(url).scheme}://{urlparse(url).netloc}"
                             contact_url = base_url + contact_url if contact_url.startswith('/') else base_url + '/' + contact_url
-                        
+                    
                         try:
-                            contact_response = requests.get(contact_url, headers=headers, timeout=5)
-                            if contact_response.status_code == 200:
-                                contact_soup = BeautifulSoup(contact_response.text, 'html.parser')
-                                emails.update(extract_emails_from_text(contact_soup.get_text(separator=' ')))
+                            contact_html = fetch_html(SESSION, contact_url, timeout=5)
+                            if contact_html is not None:
+                                emails.update(extract_emails_from_text(parse_page(contact_html)[0]))
                         except:
                             pass
-            
-            # check mailto links
-            mailto_links = soup.select('a[href^=mailto]')
-            for link in mailto_links:
-                href = link.get('href', '')
-                email = href.replace('mailto:', '').split('?')[0].strip()
-                if email:
-                    emails.add(email)
+                        if emails:
+                            break
 
-            filtered_emails = {e for e in emails if not any(x in e.lower() for x in ['example.com', 'yourdomain', 'sentry.io', 'wixpress.com'])}
+            filtered_emails = {e for e in emails if not is_blocked_email(e.lower())}
             
             if filtered_emails:
                 result = ", ".join(filtered_emails)
+                EMAIL_CACHE.set(page_key(url), result)
                 if emit_log:
                     emit_log(f"Found emails: {result}")
                 return result
@@ -87,9 +159,10 @@ def convert_leads_to_styled_xlsx(leads, output_xlsx_path):
     if not leads:
         return
     
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Generated Leads"
+    # Write-only mode streams rows out as they're appended instead of keeping every
+    # Cell object in memory, so sheet layout is set before the first row is written
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Generated Leads")
     
     fieldnames = list(leads[0].keys())
     
@@ -108,6 +181,9 @@ def convert_leads_to_styled_xlsx(leads, output_xlsx_path):
     website_fill = PatternFill(start_color='D6E8F7', end_color='D6E8F7', fill_type='solid')    # Light blue
     phone_fill = PatternFill(start_color='FFF2CC', end_color='FFF2CC', fill_type='solid')      # Light gold
     rating_fill = PatternFill(start_color='FCE4D6', end_color='FCE4D6', fill_type='solid')     # Light orange
+    email_font = Font(name='Calibri', size=10, color='375623')
+    website_font = Font(name='Calibri', size=10, color='1F4E79')
+    rating_font = Font(name='Calibri', size=10, bold=True, color='C65911')
     
     thin_border = Border(
         left=Side(style='thin', color='BFBFBF'),
@@ -116,7 +192,6 @@ def convert_leads_to_styled_xlsx(leads, output_xlsx_path):
         bottom=Side(style='thin', color='BFBFBF')
     )
     
-    # ── Write header row ──
     display_names = {
         'title': 'Business Name',
         'address': 'Address',
@@ -129,24 +204,51 @@ def convert_leads_to_styled_xlsx(leads, output_xlsx_path):
         'source_query': 'Search Query'
     }
     
+    ws.freeze_panes = 'A2'
+    
+    # ── Auto-size columns ──
+    col_widths = {
+        'title': 30, 'address': 35, 'phone': 16, 'website': 30,
+        'email': 30, 'rating': 10, 'reviews': 10, 'type': 20, 'source_query': 25
+    }
     for col_idx, key in enumerate(fieldnames, 1):
-        cell = ws.cell(row=1, column=col_idx, value=display_names.get(key, key.replace('_', ' ').title()))
+        ws.column_dimensions[get_column_letter(col_idx)].width = col_widths.get(key, 18)
+    
+    # Row heights: data rows take the sheet's default (one sheetFormatPr attribute rather
+    # than a row dimension per lead); only the header is overridden
+    ws.sheet_format.defaultRowHeight = 28
+    ws.sheet_format.customHeight = True
+    ws.row_dimensions[1].height = 25
+    
+    # ── Write header row ──
+    header = []
+    for key in fieldnames:
+        cell = WriteOnlyCell(ws, value=display_names.get(key, key.replace('_', ' ').title()))
         cell.font = header_font
         cell.fill = header_fill
         cell.alignment = header_align
         cell.border = thin_border
-    
-    ws.freeze_panes = 'A2'
-    
-    # ── Column index mapping for special coloring ──
-    col_map = {key: idx + 1 for idx, key in enumerate(fieldnames)}
+        header.append(cell)
+    ws.append(header)
     
     # ── Write data rows ──
-    for row_idx, lead in enumerate(leads, 2):
+    # Values are pulled out once as one list per column and zipped back into rows, and
+    # each column's highlight is looked up once, so cells cost no dict lookups or key tests
+    columns = [[lead.get(key, '') for lead in leads] for key in fieldnames]
+    # Special column coloring (fill, font) when cell has data
+    column_highlights = {
+        'email': (email_fill, email_font),
+        'website': (website_fill, website_font),
+        'phone': (phone_fill, cell_font),
+        'rating': (rating_fill, rating_font),
+    }
+    highlights = [column_highlights.get(key) for key in fieldnames]
+    for row_idx, values in enumerate(zip(*columns), 2):
         is_even = row_idx % 2 == 0
-        for col_idx, key in enumerate(fieldnames, 1):
-            value = lead.get(key, '')
-            cell = ws.cell(row=row_idx, column=col_idx, value=value)
+        row = []
+        for value, highlight in zip(values, highlights):
+            cell = WriteOnlyCell(ws, value=value)
+            row.append(cell)
             cell.font = cell_font
             cell.alignment = cell_align
             cell.border = thin_border
@@ -154,39 +256,20 @@ def convert_leads_to_styled_xlsx(leads, output_xlsx_path):
             if is_even:
                 cell.fill = row_even_fill
             
-            # Special column coloring when cell has data
-            if key == 'email' and value:
-                cell.fill = email_fill
-                cell.font = Font(name='Calibri', size=10, color='375623')
-            elif key == 'website' and value:
-                cell.fill = website_fill
-                cell.font = Font(name='Calibri', size=10, color='1F4E79')
-            elif key == 'phone' and value:
-                cell.fill = phone_fill
-            elif key == 'rating' and value:
-                cell.fill = rating_fill
-                cell.font = Font(name='Calibri', size=10, bold=True, color='C65911')
-    
-    # ── Auto-size columns ──
-    col_widths = {
-        'title': 30, 'address': 35, 'phone': 16, 'website': 30,
-        'email': 30, 'rating': 10, 'reviews': 10, 'type': 20, 'source_query': 25
-    }
-    for col_idx, key in enumerate(fieldnames, 1):
-        ws.column_dimensions[ws.cell(row=1, column=col_idx).column_letter].width = col_widths.get(key, 18)
-    
-    # Row heights
-    ws.row_dimensions[1].height = 25
-    for row_idx in range(2, len(leads) + 2):
-        ws.row_dimensions[row_idx].height = 28
+            if highlight and value:
+                cell.fill, cell.font = highlight
+        ws.append(row)
     
     wb.save(output_xlsx_path)
 
 
-def generate_leads(keyword, location, limit, api_key, require_email=False, require_website=False):
+def generate_leads(keyword, location, limit, api_key, require_email=False, require_website=False,
+                   scrape_emails=True):
     """
     Fetch leads using SerpAPI Google Maps search.
     Yields progress dictionaries for Server-Sent Events (SSE).
+    With scrape_emails=False (and no require_email) websites aren't visited at all
+    and leads carry only their Maps data, with an empty email.
     """
     leads = []
     seen_identifiers = set()
@@ -194,18 +277,18 @@ def generate_leads(keyword, location, limit, api_key, require_email=False, requi
     # Setup directory and filename
     os.makedirs('generated_leads', exist_ok=True)
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    safe_keyword = re.sub(r'[^a-zA-Z0-9]', '_', keyword)
-    safe_location = re.sub(r'[^a-zA-Z0-9]', '_', location)
+    safe_keyword = keyword.translate(SAFE_FILENAME_TABLE)
+    safe_location = location.translate(SAFE_FILENAME_TABLE)
     xlsx_filename = f"leads_{safe_keyword}_{safe_location}_{timestamp}.xlsx"
     xlsx_output_path = os.path.join("generated_leads", xlsx_filename)
     
     yield {"type": "log", "message": f"Starting lead generation for '{keyword}' in '{location}'. Target: {limit} leads."}
     
     query = f"{keyword} {location}"
-    start = 0
+    # Filtering on email needs the emails, whatever the caller asked for
+    scrape_emails = scrape_emails or require_email
     
-    while len(leads) < limit:
-        yield {"type": "log", "message": f"Fetching results from SerpAPI (start={start})..."}
+    def search_page(start):
         params = {
             "engine": "google_maps",
             "q": query,
@@ -213,74 +296,131 @@ def generate_leads(keyword, location, limit, api_key, require_email=False, requi
             "api_key": api_key,
             "start": start
         }
+        return serpapi_search(SERP_SESSION, params, SERP_LIMITER)
+    
+    # Pages already requested, oldest first, as (start, future)
+    pages = deque()
+    next_start = 0
+    
+    def request_pages(needed):
+        # A page holds up to 20 results (Google Maps pagination goes by 20), so this many
+        # pages are certainly needed even if every result on them becomes a lead;
+        # pages already requested count toward them
+        nonlocal next_start
+        for _ in range(min(SERP_PAGES_AHEAD, -(-needed // 20)) - len(pages)):
+            pages.append((next_start, _SERP_POOL.submit(search_page, next_start)))
+            next_start += 20
+    
+    request_pages(limit)
+    while len(leads) < limit:
+        if not pages:
+            request_pages(limit - len(leads))
+        start, page = pages.popleft()
+        yield {"type": "log", "message": f"Fetching results from SerpAPI (start={start})..."}
         
         try:
-            search = GoogleSearch(params)
-            results = search.get_dict()
+            results = page.result()
             local_results = results.get("local_results", [])
             
             if not local_results:
                 yield {"type": "log", "message": "No more results found from Google Maps."}
                 break
             
+            # Pages still needed even if all of this page's results become leads load
+            # while this page's websites are scraped
+            request_pages(limit - len(leads) - len(local_results))
+            
+            candidates = []
             for result in local_results:
-                if len(leads) >= limit:
-                    break
-                    
                 title = result.get("title")
                 phone = result.get("phone")
                 address = result.get("address")
-                website = result.get("website")
                 
-                dedup_key = phone if phone else (f"{title}|{address}" if address else title)
+                # Phone digits, else title (+ address)
+                digits = phone.translate(_KEEP_DIGITS) if phone else ''
+                website = result.get("website")
+                if digits:
+                    dedup_key = 'p:' + digits
+                elif title:
+                    dedup_key = 't:' + (f"{title}|{address}" if address else title)
+                else:
+                    dedup_key = None
                 
                 if dedup_key and dedup_key not in seen_identifiers:
                     seen_identifiers.add(dedup_key)
                     
-                    email = ""
-                    if website:
-                        yield {"type": "log", "message": f"Scraping emails from {website}..."}
-                        email = scrape_email_from_website(website)
-                        if email:
-                            yield {"type": "log", "message": f"Found emails: {email}"}
-                    
                     if require_website and not website:
                         yield {"type": "log", "message": f"Skipping {title} (no website)"}
                         continue
-                        
-                    if require_email and not email:
-                        yield {"type": "log", "message": f"Skipping {title} (no email)"}
-                        continue
-                    
-                    lead = {
-                        "title": title,
-                        "address": address,
-                        "phone": phone,
-                        "website": website,
-                        "email": email,
-                        "rating": result.get("rating"),
-                        "reviews": result.get("reviews"),
-                        "type": result.get("type"),
-                        "source_query": query,
-                    }
-                    
-                    leads.append(lead)
+                    candidates.append(result)
+            
+            # Without the email filter every candidate becomes a lead, so only the ones
+            # still needed are scraped
+            if not require_email:
+                candidates = candidates[:limit - len(leads)]
+            
+            # The page's websites are scraped in parallel and each lead is reported as its
+            # scrape finishes, so one slow site doesn't stall the stream
+            scrapes = {}
+            ready = []
+            for result in candidates:
+                website = result.get("website")
+                if website and scrape_emails:
+                    yield {"type": "log", "message": f"Scraping emails from {website}..."}
+                    scrapes[_SCRAPE_POOL.submit(scrape_email_from_website, website)] = result
+                else:
+                    ready.append((result, ""))
+            
+            def finished():
+                yield from ready
+                for future in as_completed(scrapes):
+                    yield scrapes[future], future.result()
+            
+            for result, email in finished():
+                if len(leads) >= limit:
+                    break
+                title = result.get("title")
+                if email:
+                    yield {"type": "log", "message": f"Found emails: {email}"}
                     
-                    # Emit progress update
-                    yield {
-                        "type": "progress",
-                        "count": len(leads),
-                        "total": limit,
-                        "latest_lead": title
-                    }
+                if require_email and not email:
+                    yield {"type": "log", "message": f"Skipping {title} (no email)"}
+                    continue
+                
+                lead = {
+                    "title": title,
+                    "address": result.get("address"),
+                    "phone": result.get("phone"),
+                    "website": result.get("website"),
+                    "email": email,
+                    "rating": result.get("rating"),
+                    "reviews": result.get("reviews"),
+                    "type": result.get("type"),
+                    "source_query": query,
+                }
+                
+                leads.append(lead)
+                
+                # Emit progress update
+                yield {
+                    "type": "progress",
+                    "count": len(leads),
+                    "total": limit,
+                    "latest_lead": title
+                }
             
-            start += 20 # Google maps pagination typically goes by 20
-            time.sleep(1) # Be nice to SerpAPI
+            # Scrapes not needed once the limit is reached are dropped if they haven't started
+            for future in scrapes:
+                future.cancel()
             
         except Exception as e:
             yield {"type": "error", "message": f"Google Maps/SerpAPI Error: {str(e)}"}
             return
     
+    # Pages requested ahead but no longer needed are dropped if they haven't started
+    for _, page in pages:
+        page.cancel()
+    
     # ── Build styled Excel workbook ──
     if leads:
         yield {"type": "log", "message": "📊 Building styled Excel report..."}
@@ -1,46 +1,102 @@
 import os
 import re
-import time
+import html
+import string
 import datetime
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from operator import itemgetter
 import requests
-from serpapi import GoogleSearch
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from http_utils import (
+    DiskCache, KeepCharsTable, RateLimiter, enable_dns_cache, fetch_html, iter_emails, make_session,
+    page_key, serpapi_search,
+)
+
+# Businesses enriched at once (website scrape + LinkedIn lookup each); SerpAPI calls
+# among them are still paced by SERP_LIMITER
+SCRAPE_WORKERS = 10
+_SCRAPE_POOL = ThreadPoolExecutor(max_workers=SCRAPE_WORKERS)
+# One keep-alive pool for every scrape instead of a fresh connection per requests.get
+SESSION = make_session(
+    pool_size=32,
+    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/114.0.0.0 Safari/537.36',
+    retries=2,
+)
+# New connections to a host already looked up (retries, reconnects) skip DNS
+enable_dns_cache()
+
+# SerpAPI is called over its own pooled session, retrying 429s/5xx with backoff, and
+# paced by a token bucket (2 searches a second, short bursts allowed) instead of a
+# fixed one-second sleep after every lead
+SERP_SESSION = make_session(pool_size=4)
+SERP_LIMITER = RateLimiter(2.0, burst=10)
+
+# (email, phone) per website URL (see page_key) for every HTML page that loaded, kept for
+# a week so a business that turns up again in a later search isn't scraped again
+SITE_CACHE = DiskCache(os.path.join('.cache', 'b2b_pages.sqlite'), ttl=7 * 24 * 60 * 60)
+
+# Owner/buyer found per company, kept for a month; every X-Ray lookup is a billable SerpAPI search
+DECISION_MAKER_CACHE = DiskCache(os.path.join('.cache', 'b2b_decision_makers.sqlite'), ttl=30 * 24 * 60 * 60)
+
+# Patterns are compiled once instead of on every page
+EMAIL_RE = re.compile(r'[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+')
+# Emails aren't length-filtered here, so the window around each '@' is wide enough for
+# any valid address (64-character local part, long domains)
+EMAIL_WINDOW = 256
+# Basic phone number regex (US focus but catches general formats)
+PHONE_RE = re.compile(r'\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}')
+# Filenames keep ASCII letters and digits; anything else becomes '_'
+SAFE_FILENAME_TABLE = KeepCharsTable(string.ascii_letters + string.digits, '_')
+# Pages are read with regexes over the raw markup instead of a parsed tree: these strip
+# what BeautifulSoup's get_text() leaves out (scripts, styles, comments) and then the tags
+HIDDEN_MARKUP_RE = re.compile(r'<(script|style)\b[^>]*>.*?</\1\s*>|<!--.*?-->', re.I | re.S)
+TAG_RE = re.compile(r'<[^>]*>')
+MAILTO_RE = re.compile(r'''href\s*=\s*["']?mailto:([^"'?>\s]+)''', re.I)
 
 def extract_email_and_phone_from_url(url):
     """Scrapes a given URL to find any email addresses or phone-like numbers."""
     if not url:
         return "N/A", "N/A"
+    
+    key = page_key(url)
+    cached = SITE_CACHE.get(key) if key else None
+    if cached is not None:
+        return cached
         
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/114.0.0.0 Safari/537.36'}
-        response = requests.get(url, headers=headers, timeout=5)
+        # Only the first MAX_PAGE_BYTES of the page are read; contact details sit in the
+        # header/footer markup, and bloated JS-heavy landing pages aren't buffered whole.
+        # A dead site is remembered for a day, so later runs skip it without waiting on it again
+        page = fetch_html(SESSION, url, timeout=5, remember_dead=True)
         
-        if response.status_code == 200:
-            text = response.text
-            soup = BeautifulSoup(text, 'html.parser')
-            clean_text = soup.get_text()
+        if page is not None:
+            markup = HIDDEN_MARKUP_RE.sub('', page)
             
             # Look for mailto links first (most reliable)
             email = "N/A"
-            for a in soup.find_all('a', href=True):
-                if a['href'].startswith('mailto:'):
-                    email = a['href'].replace('mailto:', '').split('?')[0].strip()
-                    break
+            mailto_match = MAILTO_RE.search(markup)
+            if mailto_match:
+                email = html.unescape(mailto_match.group(1)).strip()
+            
+            # The page's visible text, as get_text() would give it
+            clean_text = html.unescape(TAG_RE.sub('', markup))
             
             # Fallback to regex if no mailto found
+            # (the regex only runs around each '@', not over the whole page)
             if email == "N/A":
-                email_match = re.search(r'[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+', clean_text)
-                if email_match:
-                    email = email_match.group(0)
+                email = next(iter_emails(EMAIL_RE, clean_text, EMAIL_WINDOW), "N/A")
                     
-            # Basic phone number regex (US focus but catches general formats)
             phone = "N/A"
-            phone_match = re.search(r'\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}', clean_text)
+            phone_match = PHONE_RE.search(clean_text)
             if phone_match:
                 phone = phone_match.group(0)
-                
+            
+            if key:
+                SITE_CACHE.set(key, (email, phone))
             return email, phone
             
     except requests.exceptions.RequestException:
@@ -52,7 +108,27 @@ def find_decision_maker_on_linkedin(company_name, api_key):
     """Uses Google X-Ray to find the Owner or Buyer of a specific company on LinkedIn."""
     if not api_key:
         return "N/A", "N/A", "N/A"
-        
+    
+    try:
+        return _cached_decision_maker(' '.join(company_name.lower().split()), api_key)
+    except Exception:
+        # Failed searches aren't cached, so the next lookup for this company tries again
+        return "Not Found", "N/A", "N/A"
+
+@lru_cache(maxsize=4096)
+def _cached_decision_maker(company_key, api_key):
+    """Answers repeat lookups from memory, then from disk, before searching; errors propagate."""
+    cached = DECISION_MAKER_CACHE.get(company_key)
+    if cached is None:
+        cached = _search_decision_maker(company_key, api_key)
+        DECISION_MAKER_CACHE.set(company_key, cached)
+    return cached
+
+# SerpAPI answers a search with no hits with this "error"; it's an answer, not a failure,
+# so it's cached like any other "Not Found"
+NO_RESULTS_ERROR = "hasn't returned any results"
+
+def _search_decision_maker(company_name, api_key):
     query = f'site:linkedin.com/in/ "{company_name}" ("owner" OR "founder" OR "buyer" OR "purchasing")'
     params = {
         "engine": "google",
@@ -61,25 +137,23 @@ def find_decision_maker_on_linkedin(company_name, api_key):
         "num": 1
     }
     
-    try:
-        search = GoogleSearch(params)
-        results = search.get_dict()
-        organic_results = results.get("organic_results", [])
+    results = serpapi_search(SERP_SESSION, params, SERP_LIMITER)
+    if "error" in results and NO_RESULTS_ERROR not in results["error"]:
+        raise RuntimeError(results["error"])
+    organic_results = results.get("organic_results", [])
+    
+    if organic_results:
+        top_result = organic_results[0]
+        link = top_result.get("link", "")
         
-        if organic_results:
-            top_result = organic_results[0]
-            link = top_result.get("link", "")
+        if "/in/" in link:
+            raw_title = top_result.get("title", "Unknown")
+            name = raw_title.partition('-')[0].partition('|')[0].strip()
             
-            if "/in/" in link:
-                raw_title = top_result.get("title", "Unknown")
-                name = raw_title.split('-')[0].split('|')[0].strip()
-                
-                # Try to extract their exact job title from the snippet
-                snippet = top_result.get("snippet", "")
-                
-                return name, link, snippet
-    except Exception:
-        pass
+            # Try to extract their exact job title from the snippet
+            snippet = top_result.get("snippet", "")
+            
+            return name, link, snippet
         
     return "Not Found", "N/A", "N/A"
 
@@ -88,9 +162,10 @@ def convert_b2b_leads_to_styled_xlsx(leads, output_xlsx_path):
     if not leads:
         return
     
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "B2B Partners"
+    # Write-only mode streams rows out as they're appended instead of keeping every
+    # Cell object in memory, so sheet layout is set before the first row is written
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("B2B Partners")
     
     fieldnames = list(leads[0].keys())
     
@@ -108,13 +183,13 @@ def convert_b2b_leads_to_styled_xlsx(leads, output_xlsx_path):
     company_fill = PatternFill(start_color='E8F0EA', end_color='E8F0EA', fill_type='solid')
     human_fill = PatternFill(start_color='FFF3E0', end_color='FFF3E0', fill_type='solid') # Soft Gold for human
     link_font = Font(name='Calibri', size=10, color='0077B5', underline='single')
+    bold_font = Font(name='Calibri', size=10, bold=True)
     
     thin_border = Border(
         left=Side(style='thin', color='D9E1E7'), right=Side(style='thin', color='D9E1E7'),
         top=Side(style='thin', color='D9E1E7'), bottom=Side(style='thin', color='D9E1E7')
     )
     
-    # ── Write header row ──
     display_names = {
         'company_name': 'Business Name',
         'company_website': 'Website',
@@ -127,21 +202,45 @@ def convert_b2b_leads_to_styled_xlsx(leads, output_xlsx_path):
         'decision_maker_bio': 'Owner Bio / Context'
     }
     
+    ws.freeze_panes = 'A2'
+    
+    # ── Auto-size columns ──
+    col_widths = {
+        'company_name': 25, 'company_website': 25, 'company_email': 25, 'company_phone': 15,
+        'rating': 12, 'address': 30, 'decision_maker_name': 20, 'decision_maker_linkedin': 35, 'decision_maker_bio': 40
+    }
     for col_idx, key in enumerate(fieldnames, 1):
-        cell = ws.cell(row=1, column=col_idx, value=display_names.get(key, key.replace('_', ' ').title()))
+        ws.column_dimensions[get_column_letter(col_idx)].width = col_widths.get(key, 20)
+    
+    # Data rows take the sheet's default height; only the header is overridden
+    ws.sheet_format.defaultRowHeight = 30
+    ws.sheet_format.customHeight = True
+    ws.row_dimensions[1].height = 25
+    
+    # ── Write header row ──
+    header = []
+    for key in fieldnames:
+        cell = WriteOnlyCell(ws, value=display_names.get(key, key.replace('_', ' ').title()))
         cell.font = header_font
         cell.fill = header_fill
         cell.alignment = header_align
         cell.border = thin_border
-    
-    ws.freeze_panes = 'A2'
+        header.append(cell)
+    ws.append(header)
     
     # ── Write data rows ──
-    for row_idx, lead in enumerate(leads, 2):
+    # Values are pulled out once as one list per column and zipped back into rows, and
+    # each column's highlight is worked out once, so cells cost no dict lookups or key tests
+    columns = [[lead.get(key, '') for lead in leads] for key in fieldnames]
+    column_highlights = {'company_name': (company_fill, bold_font), 'decision_maker_name': (human_fill, bold_font)}
+    highlights = [column_highlights.get(key) for key in fieldnames]
+    is_link = ['website' in key or 'linkedin' in key for key in fieldnames]
+    for row_idx, values in enumerate(zip(*columns), 2):
         is_even = row_idx % 2 == 0
-        for col_idx, key in enumerate(fieldnames, 1):
-            value = lead.get(key, '')
-            cell = ws.cell(row=row_idx, column=col_idx, value=value)
+        row = []
+        for value, highlight, link in zip(values, highlights, is_link):
+            cell = WriteOnlyCell(ws, value=value)
+            row.append(cell)
             cell.font = cell_font
             cell.alignment = cell_align
             cell.border = thin_border
@@ -149,29 +248,44 @@ def convert_b2b_leads_to_styled_xlsx(leads, output_xlsx_path):
             if is_even:
                 cell.fill = row_even_fill
             
-            if key == 'company_name':
-                cell.fill = company_fill
-                cell.font = Font(name='Calibri', size=10, bold=True)
-            elif key == 'decision_maker_name':
-                cell.fill = human_fill
-                cell.font = Font(name='Calibri', size=10, bold=True)
-            elif 'website' in key or 'linkedin' in key:
+            if highlight:
+                cell.fill, cell.font = highlight
+            elif link:
                 if value and value != 'N/A' and value != 'Not Found':
                     cell.font = link_font
+        ws.append(row)
     
-    # ── Auto-size columns ──
-    col_widths = {
-        'company_name': 25, 'company_website': 25, 'company_email': 25, 'company_phone': 15,
-        'rating': 12, 'address': 30, 'decision_maker_name': 20, 'decision_maker_linkedin': 35, 'decision_maker_bio': 40
-    }
-    for col_idx, key in enumerate(fieldnames, 1):
-        ws.column_dimensions[ws.cell(row=1, column=col_idx).column_letter].width = col_widths.get(key, 20)
+    wb.save(output_xlsx_path)
+
+def enrich_business(result, api_key):
+    """Builds one B2B lead from a Maps result: scrapes its website, then finds its owner/buyer."""
+    company_name = result["title"]
+    website = result.get("website", "")
+    phone = result.get("phone", "N/A")
     
-    ws.row_dimensions[1].height = 25
-    for row_idx in range(2, len(leads) + 2):
-        ws.row_dimensions[row_idx].height = 30
+    # Scrape Website for Email
+    email = "N/A"
+    if website:
+        email, extracted_phone = extract_email_and_phone_from_url(website)
+        if phone == "N/A":
+            phone = extracted_phone
+    else:
+        website = "N/A"
+        
+    # Cross-reference LinkedIn for the human decision maker
+    dm_name, dm_link, dm_bio = find_decision_maker_on_linkedin(company_name, api_key)
     
-    wb.save(output_xlsx_path)
+    return {
+        "company_name": company_name,
+        "company_website": website,
+        "company_email": email,
+        "company_phone": phone,
+        "rating": str(result.get("rating", "N/A")),
+        "address": result.get("address", "N/A"),
+        "decision_maker_name": dm_name,
+        "decision_maker_linkedin": dm_link,
+        "decision_maker_bio": dm_bio
+    }
 
 def generate_b2b_partners(keyword, location, limit, api_key):
     """
@@ -183,8 +297,8 @@ def generate_b2b_partners(keyword, location, limit, api_key):
     
     os.makedirs('generated_leads', exist_ok=True)
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    safe_keyword = re.sub(r'[^a-zA-Z0-9]', '_', keyword)
-    safe_location = re.sub(r'[^a-zA-Z0-9]', '_', location)
+    safe_keyword = keyword.translate(SAFE_FILENAME_TABLE)
+    safe_location = location.translate(SAFE_FILENAME_TABLE)
     xlsx_filename = f"b2b_partners_{safe_keyword}_{safe_location}_{timestamp}.xlsx"
     xlsx_output_path = os.path.join("generated_leads", xlsx_filename)
     
@@ -199,66 +313,45 @@ def generate_b2b_partners(keyword, location, limit, api_key):
     }
     
     try:
-        search = GoogleSearch(params)
-        results = search.get_dict()
+        results = serpapi_search(SERP_SESSION, params, SERP_LIMITER)
         local_results = results.get("local_results", [])
         
         if not local_results:
             yield {"type": "error", "message": "No businesses found on Google Maps. Try broader terms like 'Wellness Center', 'Health Food Store', or 'Water Purification'."}
             return
-            
-        for result in local_results:
-            if len(leads) >= limit:
-                break
-                
-            company_name = result.get("title", "")
-            if not company_name:
+        
+        # Every named business becomes a lead, so the first `limit` of them are the ones
+        # processed. Each one's website scrape and LinkedIn lookup run together on the pool
+        # and leads are reported as they finish; the dossier keeps the Maps order.
+        businesses = [result for result in local_results if result.get("title")][:limit]
+        enrichments = {
+            _SCRAPE_POOL.submit(enrich_business, result, api_key): idx
+            for idx, result in enumerate(businesses)
+        }
+        yield {"type": "log", "message": f"🕵️‍♂️ Scraping websites and X-Ray searching LinkedIn for {len(businesses)} businesses..."}
+        
+        found = []
+        for future in as_completed(enrichments):
+            idx = enrichments[future]
+            # One business that can't be enriched is skipped rather than ending the run
+            try:
+                lead = future.result()
+            except Exception as e:
+                yield {"type": "log", "message": f"⚠️ Skipping {businesses[idx]['title']}: {str(e)[:80]}"}
                 continue
-                
-            website = result.get("website", "")
-            phone = result.get("phone", "N/A")
-            rating = str(result.get("rating", "N/A"))
-            address = result.get("address", "N/A")
-            
-            yield {"type": "log", "message": f"🌐 Found Business: {company_name}"}
-            
-            # Scrape Website for Email
-            email = "N/A"
-            if website:
-                yield {"type": "log", "message": f"   Scraping website for email: {website}"}
-                extracted_email, extracted_phone = extract_email_and_phone_from_url(website)
-                email = extracted_email
-                if phone == "N/A":
-                    phone = extracted_phone
-            else:
-                website = "N/A"
-                
-            # Cross-reference LinkedIn for the human decision maker
-            yield {"type": "log", "message": f"   🕵️‍♂️ X-Ray searching LinkedIn for the Owner/Buyer..."}
-            dm_name, dm_link, dm_bio = find_decision_maker_on_linkedin(company_name, api_key)
-            
-            lead = {
-                "company_name": company_name,
-                "company_website": website,
-                "company_email": email,
-                "company_phone": phone,
-                "rating": rating,
-                "address": address,
-                "decision_maker_name": dm_name,
-                "decision_maker_linkedin": dm_link,
-                "decision_maker_bio": dm_bio
-            }
-            
-            leads.append(lead)
+            found.append((idx, lead))
             
+            yield {"type": "log", "message": f"🌐 Found Business: {lead['company_name']}"}
+            yield {"type": "log", "message": f"   Email: {lead['company_email']} | Owner/Buyer: {lead['decision_maker_name']}"}
             yield {
                 "type": "progress",
-                "count": len(leads),
+                "count": len(found),
                 "total": limit,
-                "latest_lead": company_name
+                "latest_lead": lead["company_name"]
             }
-            
-            time.sleep(1) # Be respectful
+        
+        found.sort(key=itemgetter(0))
+        leads = [lead for _, lead in found]
             
     except Exception as e:
         yield {"type": "error", "message": f"B2B Search Error: {str(e)}"}
@@ -1,21 +1,82 @@
 import os
-import re
-import time
+import csv
+import string
 import datetime
-import json
-from serpapi import GoogleSearch
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from google import genai
+from http_utils import KeepCharsTable, RateLimiter, make_session, serpapi_search, warm_serpapi_connection
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:  # orjson is optional; fall back to the stdlib decoder
+    from json import loads as _json_loads
+from json import JSONDecoder
+
+# Reads one JSON value off the front of a string, ignoring whatever follows it
+_JSON_DECODER = JSONDecoder()
+
+def _find_string_list(text):
+    """
+    The first complete JSON array of strings in `text`, or None if there isn't one (yet).
+    Brackets that don't open such an array, like a "[1]" in prose before it, are skipped.
+    """
+    start = text.find('[')
+    while start != -1:
+        try:
+            value = _JSON_DECODER.raw_decode(text, start)[0]
+        except ValueError:
+            value = None
+        if value and isinstance(value, list) and all(isinstance(item, str) for item in value):
+            return value
+        start = text.find('[', start + 1)
+    return None
+
+# Filenames keep ASCII letters and digits; anything else becomes '_'
+SAFE_FILENAME_TABLE = KeepCharsTable(string.ascii_letters + string.digits, '_')
+
+# Each X-Ray query is read for up to SERP_PAGES_PER_QUERY pages of 10 results. Pages that
+# are certainly needed are fetched on workers, up to SERP_PAGES_AHEAD at once, so they
+# load in parallel instead of one after another
+SERP_PAGES_PER_QUERY = 3
+SERP_PAGES_AHEAD = 5
+_SERP_POOL = ThreadPoolExecutor(max_workers=SERP_PAGES_AHEAD)
+# SerpAPI's JSON endpoint is called directly over one keep-alive pool (with retries on
+# 429/5xx) instead of the SDK opening a new connection for every page
+SERP_SESSION = make_session(pool_size=SERP_PAGES_AHEAD)
+# Searches are paced by a token bucket rather than a fixed pause: up to 5 a second across
+# all runs, with a full read-ahead's worth allowed to start at once
+SERP_LIMITER = RateLimiter(5.0, burst=SERP_PAGES_AHEAD)
+# A campaign's leads are saved as CSV when it finishes; the styled XLSX beside it is
+# only built (once) when it's downloaded, so runs don't wait on openpyxl. Only files
+# named with SMART_CAMPAIGN_PREFIX are Smart Campaign reports.
+SMART_CAMPAIGN_PREFIX = "smart_campaign_"
+_xlsx_build_lock = threading.Lock()
+
+@lru_cache(maxsize=4)
+def _get_client(api_key):
+    """Returns the shared Gemini client for this API key, so its connection pool is reused across calls."""
+    return genai.Client(api_key=api_key)
+
+def basic_query(goal, location):
+    """The plain X-Ray query for a goal, used alongside (or instead of) Gemini's queries."""
+    return f'site:linkedin.com/in/ "{goal}" "{location}"'
 
 def generate_smart_queries(goal, location, api_key, num_queries=3):
     """Uses Gemini to translate a business goal into precise Google X-Ray queries."""
     if not api_key:
         # Fallback to a basic search if no Gemini key is provided
-        return [f'site:linkedin.com/in/ "{goal}" "{location}"']
+        return [basic_query(goal, location)]
         
     try:
-        client = genai.Client(api_key=api_key)
+        client = _get_client(api_key)
         prompt = f"""
         Act as an Expert B2B Lead Generation Architect.
         The user wants to find LinkedIn leads based on this business goal:
@@ -31,27 +92,57 @@ def generate_smart_queries(goal, location, api_key, num_queries=3):
         Format the output strictly as a JSON array of strings. Do not use markdown blocks.
         Example: ["site:linkedin.com/in/ \\"wellness center\\" \\"owner\\" \\"New York\\"", "site:linkedin.com/in/ \\"purchasing manager\\" \\"health tech\\"", "site:linkedin.com/in/ \\"biohacking\\" \\"founder\\""]
         """
-        response = client.models.generate_content(
+        # The answer is streamed and read only until its JSON array is complete, so the
+        # searches can start without waiting on a closing fence or any trailing text
+        stream = client.models.generate_content_stream(
             model='gemini-2.5-flash',
             contents=prompt,
         )
-        raw = response.text.strip()
-        if raw.startswith('```json'): raw = raw[7:]
-        if raw.endswith('```'): raw = raw[:-3]
-        
-        queries = json.loads(raw.strip())
-        return queries
+        raw = ''
+        try:
+            for chunk in stream:
+                text = chunk.text or ''
+                raw += text
+                if ']' not in text:
+                    continue
+                queries = _find_string_list(raw)
+                if queries is not None:
+                    return queries
+        finally:
+            stream.close()
+        raise ValueError(f"No JSON array of strings in response: {raw[:100]!r}")
     except Exception as e:
         print(f"Gemini query generation failed: {e}")
-        return [f'site:linkedin.com/in/ "{goal}" "{location}"']
+        return [basic_query(goal, location)]
+
+# Match reasons Gemini has written, keyed on a digest of (title, snippet, goal, api key):
+# the same "Owner at X" profile often turns up under several X-Ray queries
+MATCH_CACHE_SIZE = 2048
+_match_cache = {}
+_match_cache_lock = threading.Lock()
+
+def _match_key(title, snippet, goal, api_key):
+    # \x1f (unit separator) keeps the fields unambiguous, as in leads_core.canon_key
+    return hashlib.blake2b('\x1f'.join((title, snippet, goal, api_key)).encode(), digest_size=16).digest()
+
+def _remember_match(key, reason):
+    with _match_cache_lock:
+        if len(_match_cache) >= MATCH_CACHE_SIZE:
+            _match_cache.clear()
+        _match_cache[key] = reason
 
 def evaluate_vendor_match(title, snippet, goal, api_key):
     """Uses Gemini to briefly explain why this lead matches the goal."""
     if not api_key or (not title and not snippet):
         return "Match evaluation unavailable."
+    
+    key = _match_key(title, snippet, goal, api_key)
+    cached = _match_cache.get(key)
+    if cached is not None:
+        return cached
         
     try:
-        client = genai.Client(api_key=api_key)
+        client = _get_client(api_key)
         prompt = f"""
         Business Goal: "{goal}"
         Lead Profile: Title="{title}", Bio="{snippet}"
@@ -63,18 +154,86 @@ def evaluate_vendor_match(title, snippet, goal, api_key):
             model='gemini-2.5-flash',
             contents=prompt,
         )
-        return response.text.strip().replace('\n', ' ')
+        reason = response.text.strip().replace('\n', ' ')
+        _remember_match(key, reason)
+        return reason
     except Exception:
+        # Failures aren't cached, so the next lookup for this profile tries again
         return "Potential profile match."
 
+def evaluate_vendor_matches(profiles, goal, api_key):
+    """
+    Explains why each (title, snippet) profile matches the goal, with one Gemini request
+    for the whole batch instead of one per lead. Returns one reason per profile, in order.
+    Profiles already explained for this goal are answered from memory and left out of the
+    request. Falls back to one request per profile if the batched answer can't be parsed.
+    """
+    if not api_key:
+        return [evaluate_vendor_match(title, snippet, goal, api_key) for title, snippet in profiles]
+    
+    keys = [_match_key(title, snippet, goal, api_key) for title, snippet in profiles]
+    reasons = [_match_cache.get(key) for key in keys]
+    todo = [i for i, reason in enumerate(reasons) if reason is None]
+    if todo:
+        fresh = _evaluate_uncached_matches([profiles[i] for i in todo], goal, api_key)
+        for i, reason in zip(todo, fresh):
+            reasons[i] = reason
+    return reasons
+
+def _evaluate_uncached_matches(profiles, goal, api_key):
+    if len(profiles) <= 1:
+        return [evaluate_vendor_match(title, snippet, goal, api_key) for title, snippet in profiles]
+    
+    try:
+        client = _get_client(api_key)
+        numbered = "\n".join(
+            f'{num}. Title="{title}", Bio="{snippet}"' for num, (title, snippet) in enumerate(profiles, 1)
+        )
+        prompt = f"""
+        Business Goal: "{goal}"
+        Lead Profiles:
+        {numbered}
+        
+        For EACH lead, write a 1-sentence explanation of WHY this person is a good potential lead/vendor for the business goal.
+        Be concise, direct, and persuasive. Max 15 words per sentence.
+        
+        Format the output strictly as a JSON object mapping each lead number (as a string) to its sentence. Do not use markdown blocks.
+        Example: {{"1": "Owns a wellness clinic that could stock your product.", "2": "Purchasing manager at a health tech distributor."}}
+        """
+        response = client.models.generate_content(
+            model='gemini-2.5-flash',
+            contents=prompt,
+        )
+        raw = response.text.strip()
+        if raw.startswith('```json'): raw = raw[7:]
+        if raw.endswith('```'): raw = raw[:-3]
+        
+        reasons_by_lead = _json_loads(raw.strip())
+        reasons = []
+        for num, (title, snippet) in enumerate(profiles, 1):
+            if not title and not snippet:
+                reasons.append("Match evaluation unavailable.")
+                continue
+            reason = reasons_by_lead.get(str(num))
+            if not isinstance(reason, str) or not reason.strip():
+                raise ValueError(f"Missing match reason for lead {num}")
+            reasons.append(reason.strip().replace('\n', ' '))
+        for (title, snippet), reason in zip(profiles, reasons):
+            if title or snippet:
+                _remember_match(_match_key(title, snippet, goal, api_key), reason)
+        return reasons
+    except Exception:
+        return [evaluate_vendor_match(title, snippet, goal, api_key) for title, snippet in profiles]
+
 def convert_linkedin_leads_to_styled_xlsx(leads, output_xlsx_path):
     """Converts LinkedIn leads into a LinkedIn-branded styled Excel workbook."""
     if not leads:
         return
     
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Smart Campaign Leads"
+    # Write-only mode streams rows out as they're appended instead of keeping every
+    # Cell object in memory, so sheet layout is set before the first row is written
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Smart Campaign Leads")
     
     fieldnames = list(leads[0].keys())
     
@@ -92,6 +251,8 @@ def convert_linkedin_leads_to_styled_xlsx(leads, output_xlsx_path):
     name_fill = PatternFill(start_color='D9EBF7', end_color='D9EBF7', fill_type='solid')
     match_fill = PatternFill(start_color='E8F5E9', end_color='E8F5E9', fill_type='solid') # Light green for match
     link_font = Font(name='Calibri', size=10, color='0077B5', underline='single')
+    name_font = Font(name='Calibri', size=10, bold=True)
+    match_font = Font(name='Calibri', size=10, italic=True)
     
     thin_border = Border(
         left=Side(style='thin', color='D9E1E7'),
@@ -100,7 +261,6 @@ def convert_linkedin_leads_to_styled_xlsx(leads, output_xlsx_path):
         bottom=Side(style='thin', color='D9E1E7')
     )
     
-    # ── Write header row ──
     display_names = {
         'name': 'Full Name',
         'title': 'Job Title',
@@ -111,152 +271,242 @@ def convert_linkedin_leads_to_styled_xlsx(leads, output_xlsx_path):
         'source_query': 'AI Search Query utilized'
     }
     
-    for col_idx, key in enumerate(fieldnames, 1):
-        cell = ws.cell(row=1, column=col_idx, value=display_names.get(key, key.replace('_', ' ').title()))
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_align
-        cell.border = thin_border
-    
     ws.freeze_panes = 'A2'
     
-    # ── Write data rows ──
-    for row_idx, lead in enumerate(leads, 2):
-        is_even = row_idx % 2 == 0
-        for col_idx, key in enumerate(fieldnames, 1):
-            value = lead.get(key, '')
-            cell = ws.cell(row=row_idx, column=col_idx, value=value)
-            cell.font = cell_font
-            cell.alignment = cell_align
-            cell.border = thin_border
-            
-            if is_even:
-                cell.fill = row_even_fill
-            
-            if key == 'name':
-                cell.fill = name_fill
-                cell.font = Font(name='Calibri', size=10, bold=True)
-            elif key == 'link':
-                cell.font = link_font
-            elif key == 'match_reason':
-                cell.fill = match_fill
-                cell.font = Font(name='Calibri', size=10, italic=True)
-    
     # ── Auto-size columns ──
     col_widths = {
         'name': 25, 'title': 30, 'location': 20, 'link': 45, 'match_reason': 50, 'snippet': 40, 'source_query': 35
     }
     for col_idx, key in enumerate(fieldnames, 1):
-        ws.column_dimensions[ws.cell(row=1, column=col_idx).column_letter].width = col_widths.get(key, 20)
+        ws.column_dimensions[get_column_letter(col_idx)].width = col_widths.get(key, 20)
     
-    # Row heights
+    # Row heights: data rows take the sheet's default (one sheetFormatPr attribute rather
+    # than a row dimension per lead); only the header is overridden
+    ws.sheet_format.defaultRowHeight = 40 # Increased height for match reason wrapper
+    ws.sheet_format.customHeight = True
     ws.row_dimensions[1].height = 25
-    for row_idx in range(2, len(leads) + 2):
-        ws.row_dimensions[row_idx].height = 40 # Increased height for match reason wrapper
+    
+    # ── Write header row ──
+    header = []
+    for key in fieldnames:
+        cell = WriteOnlyCell(ws, value=display_names.get(key, key.replace('_', ' ').title()))
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = header_align
+        cell.border = thin_border
+        header.append(cell)
+    ws.append(header)
+    
+    # ── Write data rows ──
+    # Each column's (fill, font) is worked out once for even and odd rows, and values
+    # are pulled out as one list per column, so cells cost no dict lookups or key tests
+    column_styles = {
+        'name': (name_fill, name_fill, name_font),
+        'link': (row_even_fill, None, link_font),
+        'match_reason': (match_fill, match_fill, match_font),
+    }
+    plan = [column_styles.get(key, (row_even_fill, None, cell_font)) for key in fieldnames]
+    even_styles = [(even_fill, font) for even_fill, _, font in plan]
+    odd_styles = [(odd_fill, font) for _, odd_fill, font in plan]
+    columns = [[lead.get(key, '') for lead in leads] for key in fieldnames]
+    for row_idx, values in enumerate(zip(*columns), 2):
+        styles = even_styles if row_idx % 2 == 0 else odd_styles
+        row = []
+        for value, (fill, font) in zip(values, styles):
+            cell = WriteOnlyCell(ws, value=value)
+            row.append(cell)
+            cell.font = font
+            cell.alignment = cell_align
+            cell.border = thin_border
+            if fill is not None:
+                cell.fill = fill
+        ws.append(row)
     
     wb.save(output_xlsx_path)
 
+def build_linkedin_xlsx(xlsx_path):
+    """
+    Builds a Smart Campaign report from the CSV saved beside it, unless it already exists.
+    Returns False if `xlsx_path` isn't a Smart Campaign report or its CSV has no leads.
+    """
+    if not os.path.basename(xlsx_path).startswith(SMART_CAMPAIGN_PREFIX) or not xlsx_path.endswith('.xlsx'):
+        return False
+    csv_path = os.path.splitext(xlsx_path)[0] + '.csv'
+    with _xlsx_build_lock:
+        if os.path.isfile(xlsx_path):
+            return True
+        if not os.path.isfile(csv_path):
+            return False
+        with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+            leads = list(csv.DictReader(f))
+        if not leads:
+            return False
+        # Written under a temporary name, so another worker never serves a half-saved file
+        tmp_path = f"{xlsx_path}.{os.getpid()}.tmp"
+        convert_linkedin_leads_to_styled_xlsx(leads, tmp_path)
+        os.replace(tmp_path, xlsx_path)
+        return True
+
 def generate_linkedin_leads(goal, location, limit, api_key, gemini_api_key=None):
     """
     Fetch LinkedIn leads using AI-generated Smart Campaign queries via SerpAPI.
     Yields events for SSE streaming.
     """
     leads = []
-    seen_links = set()
+    # Profiles are deduped on their /in/ slug, so one person found as in.linkedin.com/in/x
+    # under one query and www.linkedin.com/in/x/?trk=... under another is kept once
+    seen_profiles = set()
     
     os.makedirs('generated_leads', exist_ok=True)
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    safe_goal = re.sub(r'[^a-zA-Z0-9]', '_', goal)[:20]
-    safe_location = re.sub(r'[^a-zA-Z0-9]', '_', location)[:15]
-    xlsx_filename = f"smart_campaign_{safe_goal}_{safe_location}_{timestamp}.xlsx"
+    safe_goal = goal[:20].translate(SAFE_FILENAME_TABLE)
+    safe_location = location[:15].translate(SAFE_FILENAME_TABLE)
+    xlsx_filename = f"{SMART_CAMPAIGN_PREFIX}{safe_goal}_{safe_location}_{timestamp}.xlsx"
     xlsx_output_path = os.path.join("generated_leads", xlsx_filename)
+    csv_output_path = os.path.splitext(xlsx_output_path)[0] + '.csv'
+    
+    def search_page(query, start):
+        params = {
+            "engine": "google",
+            "q": query,
+            "api_key": api_key,
+            "start": start,
+            "num": 10
+        }
+        return serpapi_search(SERP_SESSION, params, SERP_LIMITER)
     
     yield {"type": "log", "message": f"🤖 Analyzing Business Goal: '{goal}'..."}
     
+    # The searches can't start before Gemini has written their queries, but the connection
+    # they'll use can: it's opened while Gemini works, so the first page skips the handshake
+    _SERP_POOL.submit(warm_serpapi_connection, SERP_SESSION)
+    # Only falls back to basic_query when Gemini is unavailable or fails
     queries = generate_smart_queries(goal, location, gemini_api_key, num_queries=3)
     yield {"type": "log", "message": f"🧠 Generated {len(queries)} specific X-Ray permutations."}
     
-    for query in queries:
-        if len(leads) >= limit:
-            break
-            
-        yield {"type": "log", "message": f"🔍 Running query: {query}"}
+    # Every page the campaign may read, in reading order: each query's pages in turn
+    # (max 3 pages per query to keep it diverse)
+    page_plan = ((query, start) for query in queries for start in range(0, SERP_PAGES_PER_QUERY * 10, 10))
+    # Pages already requested, oldest first, as (query, start, future)
+    pages = deque()
+    # Queries that ran out of results; their later pages are skipped
+    exhausted = set()
+    
+    def request_pages(needed):
+        # A page holds up to 10 results, so this many pages are certainly needed
+        # even if every result on them becomes a lead; pages already requested count toward them
+        wanted = min(SERP_PAGES_AHEAD, -(-needed // 10)) - len(pages)
+        while wanted > 0:
+            planned = next(page_plan, None)
+            if planned is None:
+                return
+            if planned[0] in exhausted:
+                continue
+            pages.append((*planned, _SERP_POOL.submit(search_page, *planned)))
+            wanted -= 1
+    
+    request_pages(limit)
+    while len(leads) < limit:
+        if not pages:
+            request_pages(limit - len(leads))
+            if not pages:
+                break
+        query, start, page = pages.popleft()
+        
+        if start == 0:
+            yield {"type": "log", "message": f"🔍 Running query: {query}"}
         
-        start = 0
-        while len(leads) < limit and start < 30: # Max 3 pages per query to keep it diverse
-            params = {
-                "engine": "google",
-                "q": query,
-                "api_key": api_key,
-                "start": start,
-                "num": 10
-            }
+        try:
+            results = page.result()
+            organic_results = results.get("organic_results", [])
             
-            try:
-                search = GoogleSearch(params)
-                results = search.get_dict()
-                organic_results = results.get("organic_results", [])
+            if not organic_results:
+                # Move to next query, dropping its later pages if they haven't started
+                exhausted.add(query)
+                for queued in [p for p in pages if p[0] == query]:
+                    queued[2].cancel()
+                    pages.remove(queued)
+                continue
+            
+            # Pages still needed even if all of this page's results become leads load
+            # while this page's matches are evaluated
+            request_pages(limit - len(leads) - len(organic_results))
+            
+            # The page's new leads are collected first, then matched against the goal
+            # with one batched Gemini call
+            page_leads = []
+            for result in organic_results:
+                if len(leads) + len(page_leads) >= limit:
+                    break
+                    
+                link = result.get("link", "")
+                slug = link.partition("/in/")[2].partition("?")[0].strip("/").lower()
+                if not slug or slug in seen_profiles:
+                    continue
                 
-                if not organic_results:
-                    break # Move to next query
+                seen_profiles.add(slug)
                 
-                for result in organic_results:
-                    if len(leads) >= limit:
-                        break
-                        
-                    link = result.get("link", "")
-                    if "/in/" not in link or link in seen_links:
-                        continue
-                    
-                    seen_links.add(link)
-                    
-                    raw_title = result.get("title", "Unknown")
-                    name = raw_title.split('-')[0].split('|')[0].strip()
-                    
-                    job_title = "N/A"
-                    if '-' in raw_title:
-                        parts = raw_title.split('-')
-                        if len(parts) > 1:
-                            job_title = parts[1].split('|')[0].strip()
-                    
-                    snippet = result.get("snippet", "")
-                    
-                    # AI Match Analysis
-                    yield {"type": "log", "message": f"⚙️ Evaluating match: {name}"}
-                    match_reason = evaluate_vendor_match(job_title, snippet, goal, gemini_api_key)
-                    
-                    lead = {
-                        "name": name,
-                        "title": job_title,
-                        "location": location,
-                        "link": link,
-                        "match_reason": match_reason,
-                        "snippet": snippet,
-                        "source_query": query
-                    }
-                    
-                    leads.append(lead)
-                    
-                    yield {
-                        "type": "progress",
-                        "count": len(leads),
-                        "total": limit,
-                        "latest_lead": name
-                    }
+                # "Name - Job Title - Company | LinkedIn": partition stops at the first
+                # separator instead of splitting the whole title into a list
+                raw_title = result.get("title", "Unknown")
+                name_part, dash, rest = raw_title.partition('-')
+                name = name_part.partition('|')[0].strip()
                 
-                start += 10
-                time.sleep(1)
+                job_title = "N/A"
+                if dash:
+                    job_title = rest.partition('-')[0].partition('|')[0].strip()
                 
-            except Exception as e:
-                yield {"type": "error", "message": f"LinkedIn Search Error: {str(e)}"}
-                return
+                snippet = result.get("snippet", "")
+                
+                page_leads.append({
+                    "name": name,
+                    "title": job_title,
+                    "location": location,
+                    "link": link,
+                    "match_reason": "",
+                    "snippet": snippet,
+                    "source_query": query
+                })
+            
+            if not page_leads:
+                continue
+            
+            # AI Match Analysis
+            yield {"type": "log", "message": f"⚙️ Evaluating {len(page_leads)} matches: {', '.join(lead['name'] for lead in page_leads)}"}
+            match_reasons = evaluate_vendor_matches(
+                [(lead["title"], lead["snippet"]) for lead in page_leads], goal, gemini_api_key
+            )
+            
+            for lead, match_reason in zip(page_leads, match_reasons):
+                lead["match_reason"] = match_reason
+                leads.append(lead)
                 
+                yield {
+                    "type": "progress",
+                    "count": len(leads),
+                    "total": limit,
+                    "latest_lead": lead["name"]
+                }
+            
+        except Exception as e:
+            for *_, pending in pages:
+                pending.cancel()
+            yield {"type": "error", "message": f"LinkedIn Search Error: {str(e)}"}
+            return
+    
+    # Pages requested ahead but no longer needed are dropped if they haven't started
+    for *_, page in pages:
+        page.cancel()
+            
     if leads:
-        yield {"type": "log", "message": "📊 Formatting Smart Campaign Report..."}
+        yield {"type": "log", "message": "📊 Saving Smart Campaign Report..."}
         try:
-            convert_linkedin_leads_to_styled_xlsx(leads, xlsx_output_path)
+            with open(csv_output_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=leads[0].keys())
+                writer.writeheader()
+                writer.writerows(leads)
         except Exception as e:
-            yield {"type": "error", "message": f"Excel generation failed: {str(e)}"}
+            yield {"type": "error", "message": f"Saving leads failed: {str(e)}"}
             return
             
     yield {"type": "log", "message": f"✨ Success! Compiled {len(leads)} targeted LinkedIn leads."}
@@ -1,50 +1,59 @@
 import csv
+from contextlib import ExitStack
+from functools import lru_cache
+
+# Strong manufacturer indicators
+MANUFACTURER_KEYWORDS = (
+    'manufacturer',
+    'manufacturing',
+    'factory',
+    'industrial equipment',
+    'chemical manufacturer',
+    'machining manufacturer',
+)
+
+# Vendor/Dealer/Distributor indicators
+VENDOR_KEYWORDS = (
+    'vendor',
+    'dealer',
+    'distributor',
+    'supplier',
+    'seller',
+    'reseller',
+    'showroom',
+    'retail',
+)
 
 def classify_as_manufacturer(lead):
     """
     Determine if a lead is a manufacturer or vendor/dealer.
     Returns True if manufacturer, False if vendor/dealer.
     """
-    business_type = (lead.get('type') or '').lower()
-    source_query = (lead.get('source_query') or '').lower()
-    
-    # Strong manufacturer indicators
-    manufacturer_keywords = [
-        'manufacturer',
-        'manufacturing',
-        'factory',
-        'industrial equipment',
-        'chemical manufacturer',
-        'machining manufacturer',
-    ]
-    
-    # Vendor/Dealer/Distributor indicators
-    vendor_keywords = [
-        'vendor',
-        'dealer',
-        'distributor',
-        'supplier',
-        'seller',
-        'reseller',
-        'showroom',
-        'retail',
-    ]
+    return classify_type_and_query(lead.get('type') or '', lead.get('source_query') or '')
+
+# A CSV holds a few dozen Maps categories and search queries repeated over thousands of
+# rows, so each (type, query) pair is classified once and later rows are a cache hit
+@lru_cache(maxsize=4096)
+def classify_type_and_query(business_type, source_query):
+    """classify_as_manufacturer for a lead's raw type and source_query strings."""
+    business_type = business_type.lower()
+    source_query = source_query.lower()
     
     # Check business type first (more reliable)
-    for keyword in manufacturer_keywords:
+    for keyword in MANUFACTURER_KEYWORDS:
         if keyword in business_type:
             return True
     
-    for keyword in vendor_keywords:
+    for keyword in VENDOR_KEYWORDS:
         if keyword in business_type:
             return False
     
     # If business type is ambiguous, check source query
-    for keyword in manufacturer_keywords:
+    for keyword in MANUFACTURER_KEYWORDS:
         if keyword in source_query:
             return True
     
-    for keyword in vendor_keywords:
+    for keyword in VENDOR_KEYWORDS:
         if keyword in source_query:
             return False
     
@@ -57,35 +66,47 @@ def classify_as_manufacturer(lead):
 def split_leads_by_type(input_file, output_manufacturers, output_vendors):
     """
     Read CSV and split into manufacturer and vendor files.
+    Rows are streamed straight to their file as plain lists, so nothing is held in
+    memory; each output file is only created once it has a row to hold.
     """
-    manufacturers = []
-    vendors = []
-    
-    with open(input_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
+    paths = {True: output_manufacturers, False: output_vendors}
+    writers = {}
+    counts = {True: 0, False: 0}
+    
+    with open(input_file, 'r', encoding='utf-8', newline='') as f, ExitStack() as outputs:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return 0, 0
+        type_idx = header.index('type') if 'type' in header else None
+        query_idx = header.index('source_query') if 'source_query' in header else None
+        width = len(header)
+        
         for row in reader:
-            if classify_as_manufacturer(row):
-                manufacturers.append(row)
-            else:
-                vendors.append(row)
-    
-    # Write manufacturers
-    if manufacturers:
-        with open(output_manufacturers, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=manufacturers[0].keys())
-            writer.writeheader()
-            writer.writerows(manufacturers)
-        print(f"✅ Created {output_manufacturers} with {len(manufacturers)} manufacturers")
-    
-    # Write vendors
-    if vendors:
-        with open(output_vendors, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=vendors[0].keys())
-            writer.writeheader()
-            writer.writerows(vendors)
-        print(f"✅ Created {output_vendors} with {len(vendors)} vendors/dealers")
-    
-    return len(manufacturers), len(vendors)
+            if not row:
+                continue
+            # Short rows are padded, as DictReader would fill them in
+            if len(row) < width:
+                row += [''] * (width - len(row))
+            
+            is_manufacturer = classify_type_and_query(
+                row[type_idx] if type_idx is not None else '',
+                row[query_idx] if query_idx is not None else '',
+            )
+            writer = writers.get(is_manufacturer)
+            if writer is None:
+                output_file = outputs.enter_context(open(paths[is_manufacturer], 'w', newline='', encoding='utf-8'))
+                writer = writers[is_manufacturer] = csv.writer(output_file)
+                writer.writerow(header)
+            writer.writerow(row)
+            counts[is_manufacturer] += 1
+    
+    if counts[True]:
+        print(f"✅ Created {output_manufacturers} with {counts[True]} manufacturers")
+    if counts[False]:
+        print(f"✅ Created {output_vendors} with {counts[False]} vendors/dealers")
+    
+    return counts[True], counts[False]
 
 if __name__ == "__main__":
     print("\n" + "="*60)